@@ -0,0 +1,110 @@
+import atexit
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+
+ANALYTICS_FIELDS = ("profile_views", "search_appearances")
+
+
+class AnalyticsBuffer:
+    """
+    Aggregates business_analytics increments in memory and writes them
+    out in bulk from a background thread instead of once per event.
+    """
+
+    def __init__(self, flush_interval=10):
+        self.flush_interval = flush_interval
+        self.supabase = None
+        self.logger = None
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.supabase = app.supabase
+        self.logger = app.logger
+        self.flush_interval = app.config.get('ANALYTICS_FLUSH_INTERVAL', self.flush_interval)
+        app.extensions['analytics_buffer'] = self
+        atexit.register(self.shutdown)
+
+    def increment(self, business_id, field, amount=1):
+        if field not in ANALYTICS_FIELDS:
+            raise ValueError(f"Unknown analytics field: {field}")
+        key = (int(business_id), date.today().isoformat(), field)
+        with self._lock:
+            self._counts[key] += amount
+        self._ensure_worker()
+
+    def increment_many(self, business_ids, field):
+        today = date.today().isoformat()
+        with self._lock:
+            for business_id in business_ids:
+                self._counts[(int(business_id), today, field)] += 1
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Gunicorn forks after the app is created, so each worker has to
+        # start its own flush thread rather than inheriting the master's.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='analytics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _drain(self):
+        with self._lock:
+            counts = self._counts
+            self._counts = defaultdict(int)
+        return counts
+
+    def _restore(self, counts):
+        with self._lock:
+            for key, value in counts.items():
+                self._counts[key] += value
+
+    def flush(self):
+        with self._flush_lock:
+            counts = self._drain()
+            if not counts:
+                return 0
+            try:
+                self._write(counts)
+            except Exception as e:
+                self._restore(counts)
+                if self.logger:
+                    self.logger.warning(f"Analytics flush failed, {len(counts)} counters kept for retry: {e}")
+                return 0
+            return len(counts)
+
+    def _write(self, counts):
+        rows = defaultdict(lambda: dict.fromkeys(ANALYTICS_FIELDS, 0))
+        for (business_id, day, field), value in counts.items():
+            rows[(business_id, day)][field] += value
+
+        payload = [
+            {"business_id": business_id, "date": day, **deltas}
+            for (business_id, day), deltas in rows.items()
+        ]
+        # Increments are applied server-side in one statement, so concurrent
+        # workers flushing the same business never overwrite each other.
+        self.supabase.rpc("increment_business_analytics_bulk", {"p_rows": payload}).execute()
+
+    def shutdown(self):
+        self._stop.set()
+        if self.supabase is not None:
+            self.flush()
+
+
+analytics_buffer = AnalyticsBuffer()
@@ -1,18 +1,21 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
-from werkzeug.security import generate_password_hash
 from flask_login import login_user, logout_user, login_required
-from models import get_user_by_username_or_email
+from models import get_user_by_username_or_email, invalidate_user, invalidate_users
 from utils import generate_confirmation_token, confirm_token
 from itsdangerous import URLSafeTimedSerializer
 from datetime import datetime
-import requests
-from flask import session
+from flask import session, jsonify
 import os
 from datetime import datetime, timedelta
 from flask import render_template, url_for, current_app
 from itsdangerous import URLSafeTimedSerializer
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
+from outbox import enqueue_email
+from recaptcha import recaptcha
+from passwords import password_hasher, PasswordPoolBusy
+from identity_index import identity_index, conflicting_field
+from postgrest.exceptions import APIError
+from search import UNIQUE_VIOLATION
+from emails import email_templates, ConfirmAccountEmail, PasswordResetEmail
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -27,33 +30,17 @@ def generate_confirmation_token(email):
 def send_confirmation_email(user_email):
     token = generate_confirmation_token(user_email)
     confirm_url = url_for('auth.confirm_email', token=token, _external=True)
-    html_content = render_template('confirm.html', confirm_url=confirm_url)
-    subject = "Please confirm your email"
-
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = current_app.config['BREVO_API_KEY']
-
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-
-    sender = {
-        "email": current_app.config['MAIL_DEFAULT_SENDER'],
-        "name": current_app.config.get('MAIL_DEFAULT_SENDER', 'Localate') 
-    }
-
-    to = [{"email": user_email}]
-    
-    send_email = sib_api_v3_sdk.SendSmtpEmail(
-        to=to,
-        html_content=html_content,
-        sender=sender,
-        subject=subject
-    )
+    subject, html_content = email_templates.render(ConfirmAccountEmail(confirm_url=confirm_url))
 
     try:
-        api_instance.send_transac_email(send_email)
-        print(f"Confirmation email sent to {user_email}")
-    except ApiException as e:
-        print(f"Failed to send confirmation email: {e}")
+        enqueue_email(
+            user_email,
+            subject,
+            html_content,
+            sender_name=current_app.config.get('MAIL_DEFAULT_SENDER', 'Localate')
+        )
+    except Exception as e:
+        print(f"Failed to queue confirmation email: {e}")
 
 def generate_reset_token(email):
     serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
@@ -68,21 +55,7 @@ def confirm_reset_token(token, expiration=3600):
     return email
 
 def verify_recaptcha(token):
-    secret_key = os.getenv("RECAPTCHA_SECRET_KEY")
-    url = "https://www.google.com/recaptcha/api/siteverify"
-    data = {
-        'secret': secret_key,
-        'response': token
-    }
-    
-    try:
-        response = requests.post(url, data=data)
-        result = response.json()
-        print("reCAPTCHA result:", result)  
-        return result.get("success", False) and result.get("score", 0) >= 0.5
-    except Exception:
-        print("reCAPTCHA error:")
-        return False
+    return recaptcha.verify(token, request.remote_addr)
 
 @auth_bp.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -108,44 +81,50 @@ def signup():
             flash('Password must be 8-30 characters long.')
             return redirect(url_for('auth.signup'))
 
-        if get_user_by_username_or_email(username):
-            flash('Username already exists.')
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordPoolBusy:
+            flash('We are handling a lot of sign-ups right now. Please try again in a moment.', 'warning')
             return redirect(url_for('auth.signup'))
-        
-        existing_user = get_user_by_username_or_email(email)
 
+        # One insert; the unique constraints on username and email decide
+        # conflicts, so two concurrent sign-ups can't both pass a lookup.
+        supabase = current_app.supabase
+        try:
+            response = supabase.table('users').insert({
+                "username": username,
+                "email": email,
+                "password_hash": password_hash,
+                "confirmed": False,
+                "confirmed_on": None
+            }).execute()
+        except APIError as e:
+            field = conflicting_field(e.message, e.details) if e.code == UNIQUE_VIOLATION else None
+            if field is None:
+                raise
+            if field == 'username':
+                flash('Username already exists.')
+                return redirect(url_for('auth.signup'))
 
-        if existing_user:
-            if existing_user.confirmed:
-
+            existing_user = identity_index.find('email', email, use_filter=False)
+            if existing_user and existing_user.get('confirmed'):
                 flash('Email already registered. Please log in.', 'error')
                 return redirect(url_for('auth.login'))
-            
-            else:
-                flash(
-                    'An account with this email already exists but is not verified. '
-                    'Check your email or resend the verification email with the button below.',
-                'warning'
-                )
-                session['unverified_email'] = email
-                session['show_resend_button'] = True
-                return redirect(url_for('auth.signup'))
 
-
-        password_hash = generate_password_hash(password)
-        supabase = current_app.supabase
-        response = supabase.table('users').insert({
-            "username": username,
-            "email": email,
-            "password_hash": password_hash,
-            "confirmed": False,
-            "confirmed_on": None
-        }).execute()
+            flash(
+                'An account with this email already exists but is not verified. '
+                'Check your email or resend the verification email with the button below.',
+            'warning'
+            )
+            session['unverified_email'] = email
+            session['show_resend_button'] = True
+            return redirect(url_for('auth.signup'))
 
         data = response.data
         if not data:
             flash('Error creating user. Please try again.')
             return redirect(url_for('auth.signup'))
+        identity_index.add(username, email)
         
         if not current_app.config.get('TESTING'):
             send_confirmation_email(email)
@@ -163,6 +142,20 @@ def signup():
         show_resend_button=show_resend_button,
         email=unverified_email)
 
+@auth_bp.route('/check_availability')
+def check_availability():
+    # Usernames only: whether an email is registered stays behind the
+    # reCAPTCHA-protected signup form, so this can't enumerate accounts.
+    result = {}
+    username = request.args.get('username', '').strip()
+    if username:
+        try:
+            result['username'] = {"available": identity_index.find('username', username) is None}
+        except Exception as e:
+            current_app.logger.warning(f"Availability check failed: {e}")
+            result['username'] = {"available": None}
+    return jsonify(result)
+
 @auth_bp.route('/resend_verification', methods=['POST'])
 def resend_verification():
     email = request.form.get('email')
@@ -220,12 +213,27 @@ def confirm_email(token):
             "confirmed": True,
             "confirmed_on": datetime.utcnow().isoformat()
         }).eq('email', email).execute()
+        invalidate_user(user.id)
         message = "You have confirmed your account and may now login."
         session.pop('unverified_email', None)
         session.pop('show_resend_button', None)
 
     return render_template('confirm_result.html', message=message)
 
+def rehash_password(user, password):
+    """Upgrade a hash made with an older method or work factor after a good login."""
+    try:
+        if not password_hasher.needs_rehash(user.password_hash):
+            return
+        current_app.supabase.table('users')\
+            .update({'password_hash': password_hasher.hash(password)})\
+            .eq('id', user.id)\
+            .eq('password_hash', user.password_hash)\
+            .execute()
+        invalidate_user(user.id)
+    except Exception as e:
+        current_app.logger.warning(f"Could not rehash password for user {user.id}: {e}")
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -238,11 +246,18 @@ def login():
 
         user = get_user_by_username_or_email(username_or_email)
 
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordPoolBusy:
+            flash('We are handling a lot of logins right now. Please try again in a moment.', 'warning')
+            return redirect(url_for('auth.login'))
+
+        if valid:
             if not user.confirmed:
                 flash('Please confirm your email before logging in.', 'warning')
                 return redirect(url_for('auth.login'))
 
+            rehash_password(user, password)
             login_user(user)
             return redirect(url_for('business.dashboard'))
 
@@ -278,44 +293,19 @@ def forgot_password():
         if user:
             token = generate_reset_token(email)
             reset_url = url_for('auth.reset_password', token=token, _external=True)
-            subject = "Reset Your Password"
-
-            configuration = sib_api_v3_sdk.Configuration()
-            configuration.api_key['api-key'] = current_app.config['BREVO_API_KEY']
-            api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-
-            sender = {
-                "email": current_app.config['MAIL_DEFAULT_SENDER'],
-                "name": current_app.config.get('MAIL_SENDER_NAME', 'Localate')
-            }
-            to = [{"email": email}]
-
-            html_content = f"""
-            <div style="background-color:#1f1f1f; color:#b37bff; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; padding: 2em; border-radius: 10px; max-width: 600px; margin: auto;">
-                <h2 style="color:#d4b3ff; margin-bottom: 0.5em;">Password Reset Request 🔐</h2>
-                <p>Hi,</p>
-                <p>We received a request to reset your password. Click the button below to set a new password:</p>
-                <p style="text-align: center; margin: 2em 0;">
-                    <a href="{reset_url}" style="background-color:#a78bfa; color:#1f1f1f; padding: 0.75em 1.5em; border-radius: 8px; text-decoration: none; font-weight: 600;">Reset Password</a>
-                </p>
-                <p>If you did not request a password reset, you can safely ignore this email.</p>
-                <p style="margin-top: 1.5em;">Thanks,<br>Your Friendly Team</p>
-            </div>
-            """
-
-            send_email = sib_api_v3_sdk.SendSmtpEmail(
-                to=to,
-                html_content=html_content,
-                sender=sender,
-                subject=subject
-            )
+            subject, html_content = email_templates.render(PasswordResetEmail(reset_url=reset_url))
 
             try:
-                api_instance.send_transac_email(send_email)
+                enqueue_email(
+                    email,
+                    subject,
+                    html_content,
+                    sender_name=current_app.config.get('MAIL_SENDER_NAME', 'Localate')
+                )
                 session['last_password_reset_sent'] = now.isoformat()
                 flash('Password reset instructions have been sent to your email. Please check spam folder just in case.', 'info')
-            except ApiException as e:
-                print(f"Error sending reset email: {e}")
+            except Exception as e:
+                print(f"Error queueing reset email: {e}")
                 flash('There was a problem sending the reset email. Please try again later.', 'error')
         else:
             flash('Email address not found.', 'error')
@@ -347,12 +337,17 @@ def reset_password(token):
             flash('Password must be between 8 and 30 characters.', 'error')
             return redirect(url_for('auth.reset_password', token=token))
 
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordPoolBusy:
+            flash('We are handling a lot of requests right now. Please try again in a moment.', 'warning')
+            return redirect(url_for('auth.reset_password', token=token))
         supabase = current_app.supabase
         response = supabase.table('users')\
             .update({'password_hash': password_hash})\
             .eq('email', email)\
             .execute()
+        invalidate_users(response.data)
 
         if not response.data:
             flash('An error occurred updating your password. Please try again.', 'error')
@@ -0,0 +1,179 @@
+import json
+from datetime import datetime, date, timedelta
+import pytz
+from cache import TTLCache
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MAX_RANGE_DAYS = 31
+
+
+def _minutes(value):
+    parts = str(value).split(':')
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def _format(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class Schedule:
+    """A business's bookable grid: slot i starts at opening + i * interval."""
+
+    def __init__(self, business):
+        self.business_id = business['id']
+        self.interval = int(business['interval']) if business.get('interval') else None
+        self.opening = _minutes(business['opening_time']) if business.get('opening_time') else 0
+        self.closing = _minutes(business['closing_time']) if business.get('closing_time') else 0
+        open_days = business.get('open_days') or []
+        if isinstance(open_days, str) and open_days.startswith('['):
+            open_days = json.loads(open_days)
+        self.open_days = set(open_days)
+        try:
+            self.tz = pytz.timezone(business.get('timezone') or 'UTC')
+        except pytz.UnknownTimeZoneError:
+            self.tz = pytz.utc
+
+    @property
+    def slot_count(self):
+        if not self.interval or self.closing <= self.opening:
+            return 0
+        return -(-(self.closing - self.opening) // self.interval)
+
+    @property
+    def signature(self):
+        return (self.opening, self.closing, self.interval)
+
+    def is_open(self, day):
+        return DAY_NAMES[day.weekday()] in self.open_days
+
+    def slot_index(self, time_value):
+        if not self.interval:
+            return None
+        offset = _minutes(time_value) - self.opening
+        if offset < 0:
+            return None
+        index = offset // self.interval
+        return index if index < self.slot_count else None
+
+    def slot_time(self, index):
+        return _format(self.opening + index * self.interval)
+
+
+class AvailabilityService:
+    """
+    Free appointment slots per business-day, kept as an int bitmap of
+    booked slots. Bitmaps are loaded for a whole date range with one
+    appointments query and then updated in place by bookings and
+    cancellations. The short TTL bounds staleness from other workers.
+    """
+
+    def __init__(self, ttl=120):
+        self.schedules = TTLCache('availability-schedules', maxsize=2048, ttl=ttl)
+        self.bitmaps = TTLCache('availability-bitmaps', maxsize=16384, ttl=ttl)
+
+    def _bitmap_key(self, schedule, day):
+        return (schedule.business_id, day.isoformat(), schedule.signature)
+
+    def schedule(self, supabase, business_id):
+        schedule = self.schedules.get(business_id)
+        if schedule is None:
+            response = supabase.table('businesses') \
+                .select('id, opening_time, closing_time, interval, open_days, timezone') \
+                .eq('id', business_id) \
+                .execute()
+            if not response.data:
+                return None
+            schedule = Schedule(response.data[0])
+            self.schedules.set(business_id, schedule)
+        return schedule
+
+    def booked_bitmaps(self, supabase, schedule, days):
+        bitmaps = {}
+        missing = []
+        for day in days:
+            bits = self.bitmaps.get(self._bitmap_key(schedule, day))
+            if bits is None:
+                missing.append(day)
+            else:
+                bitmaps[day] = bits
+
+        if missing:
+            response = supabase.table('appointments') \
+                .select('date, time') \
+                .eq('business_id', schedule.business_id) \
+                .gte('date', missing[0].isoformat()) \
+                .lte('date', missing[-1].isoformat()) \
+                .execute()
+            loaded = dict.fromkeys(missing, 0)
+            for appt in response.data or []:
+                day = date.fromisoformat(appt['date'])
+                index = schedule.slot_index(appt['time'])
+                if day in loaded and index is not None:
+                    loaded[day] |= 1 << index
+            for day, bits in loaded.items():
+                self.bitmaps.set(self._bitmap_key(schedule, day), bits)
+            bitmaps.update(loaded)
+        return bitmaps
+
+    def free_slots(self, supabase, business_id, start=None, days=14):
+        schedule = self.schedule(supabase, business_id)
+        if schedule is None:
+            return None
+        if not schedule.slot_count:
+            return {'interval': schedule.interval, 'days': []}
+
+        now_local = datetime.now(schedule.tz)
+        today = now_local.date()
+        start = max(start or today, today)
+        days = max(1, min(days, MAX_RANGE_DAYS))
+        open_days = [
+            start + timedelta(days=offset)
+            for offset in range(days)
+            if schedule.is_open(start + timedelta(days=offset))
+        ]
+        if not open_days:
+            return {'interval': schedule.interval, 'days': []}
+
+        booked = self.booked_bitmaps(supabase, schedule, open_days)
+        all_slots = (1 << schedule.slot_count) - 1
+
+        result = []
+        for day in open_days:
+            free = all_slots & ~booked[day]
+            if day == today:
+                # Drop slots that have already started in the business's timezone.
+                elapsed = now_local.hour * 60 + now_local.minute - schedule.opening
+                if elapsed >= 0:
+                    started = min(schedule.slot_count, elapsed // schedule.interval + 1)
+                    free &= ~((1 << started) - 1)
+            slots = [schedule.slot_time(i) for i in range(schedule.slot_count) if free >> i & 1]
+            if slots:
+                result.append({'date': day.isoformat(), 'slots': slots})
+        return {'interval': schedule.interval, 'days': result}
+
+    def _update(self, business_id, day, time_value, booked):
+        schedule = self.schedules.get(business_id)
+        if schedule is None:
+            return
+        day = date.fromisoformat(str(day))
+        key = self._bitmap_key(schedule, day)
+        bits = self.bitmaps.get(key)
+        index = schedule.slot_index(time_value)
+        if bits is None or index is None:
+            return
+        bits = bits | (1 << index) if booked else bits & ~(1 << index)
+        self.bitmaps.set(key, bits)
+
+    def mark_booked(self, business_id, day, time_value):
+        self._update(business_id, day, time_value, booked=True)
+
+    def mark_free(self, business_id, day, time_value):
+        self._update(business_id, day, time_value, booked=False)
+
+    def invalidate_business(self, business_id):
+        # Bitmaps are keyed on the schedule, so a changed grid never reuses
+        # old ones; dropping the schedule is enough to pick up the change.
+        self.schedules.invalidate(business_id)
+
+
+availability = AvailabilityService()
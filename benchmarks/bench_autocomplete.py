@@ -0,0 +1,74 @@
+"""
+Latency of PrefixIndex lookups over synthetic business names, the structure
+behind /search/autocomplete. Runs without a database.
+
+    python benchmarks/bench_autocomplete.py --names 200000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from prefix_index import PrefixIndex
+
+WORDS = [
+    'barber', 'salon', 'nails', 'threading', 'studio', 'fitness', 'yoga', 'auto', 'repair',
+    'bakery', 'coffee', 'tattoo', 'spa', 'massage', 'dental', 'clinic', 'pet', 'grooming',
+    'lash', 'brow', 'kitchen', 'tutoring', 'music', 'dance', 'photo', 'print', 'cleaning'
+]
+
+
+def synthetic_names(count):
+    for i in range(count):
+        words = random.sample(WORDS, random.randint(1, 3))
+        suffix = ''.join(random.choices(string.ascii_lowercase, k=4))
+        yield {'id': i, 'name': ' '.join(words).title() + f' {suffix}', 'review_count': random.randint(0, 500)}
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50000)
+    args = parser.parse_args()
+    random.seed(0)
+
+    index = PrefixIndex(k=10)
+    started = time.perf_counter()
+    index.build(synthetic_names(args.names))
+    print(f"Built index of {len(index)} names in {time.perf_counter() - started:.2f}s")
+
+    # What a user types, one keystroke at a time.
+    queries = []
+    while len(queries) < args.queries:
+        word = random.choice(WORDS)
+        queries.extend(word[:n] for n in range(1, len(word) + 1))
+    queries = queries[:args.queries]
+
+    samples = []
+    for q in queries:
+        started = time.perf_counter_ns()
+        index.search(q, 10)
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    samples.sort()
+
+    print(f"{len(samples)} lookups (microseconds)")
+    for label, p in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('p99.9', 0.999)):
+        print(f"  {label:>6}: {percentile(samples, p):8.1f}")
+    print(f"  {'max':>6}: {samples[-1]:8.1f}")
+
+    started = time.perf_counter()
+    for i in range(1000):
+        index.upsert(i, f'Renamed Business {i}', i)
+    print(f"Incremental upsert: {(time.perf_counter() - started) * 1000:.1f} us each")
+
+
+if __name__ == '__main__':
+    main()
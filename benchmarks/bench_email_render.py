@@ -0,0 +1,61 @@
+"""
+Per-email render cost of the transactional templates: the precompiled
+registry against parsing the template source for every email, which is
+what building each one from scratch costs. Runs without a database.
+
+    python benchmarks/bench_email_render.py --emails 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dataclasses import asdict
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from emails import TEMPLATE_DIR, EmailTemplates, AppointmentBookedEmail
+
+
+def sample(i):
+    return AppointmentBookedEmail(
+        business_name=f'Threading Studio {i}',
+        name='Jordan Lee',
+        email=f'user{i}@example.com',
+        phone='555-0100',
+        date='2026-10-17',
+        time='2:30 PM',
+        calendar_url=f'https://calendar.google.com/event?id={i}'
+    )
+
+
+def time_per_email(render, count):
+    started = time.perf_counter()
+    for i in range(count):
+        render(sample(i))
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--emails', type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    registry = EmailTemplates()
+    registry.init_app()
+    print(f"registry startup: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    with open(os.path.join(TEMPLATE_DIR, AppointmentBookedEmail.template)) as f:
+        source = f.read()
+
+    def parse_every_time(email):
+        env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+        return env.from_string(source).render(asdict(email))
+
+    print(f"precompiled:      {time_per_email(registry.render, args.emails):8.1f} us/email")
+    print(f"parse per email:  {time_per_email(parse_every_time, args.emails):8.1f} us/email")
+
+
+if __name__ == '__main__':
+    main()
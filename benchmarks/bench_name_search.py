@@ -0,0 +1,105 @@
+"""
+Times business name lookups on a synthetic businesses table in a local
+Postgres, before and after the pg_trgm index from migrations/004.
+
+    LOCAL_DATABASE_URL=postgresql://... python benchmarks/bench_name_search.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import time
+import psycopg2
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', '004_businesses_name_trgm.sql')
+
+WORDS = [
+    'barber', 'salon', 'nails', 'threading', 'studio', 'fitness', 'yoga', 'auto', 'repair',
+    'bakery', 'coffee', 'tattoo', 'spa', 'massage', 'dental', 'clinic', 'pet', 'grooming',
+    'lash', 'brow', 'kitchen', 'tutoring', 'music', 'dance', 'photo', 'print', 'cleaning'
+]
+QUERIES = ['barb', 'threading', 'yoga studio', 'tattoo', 'zz']
+TYPOS = ['thredding', 'barbr', 'massge', 'grooimng']
+
+
+def setup(cur, rows):
+    cur.execute("DROP SCHEMA IF EXISTS bench_names CASCADE")
+    cur.execute("CREATE SCHEMA bench_names")
+    cur.execute("SET search_path TO bench_names, public")
+    cur.execute("""
+        CREATE TABLE businesses (
+            id bigserial PRIMARY KEY,
+            name text NOT NULL,
+            review_count integer NOT NULL DEFAULT 0
+        )
+    """)
+    words = "ARRAY[" + ",".join(f"'{w}'" for w in WORDS) + "]"
+    cur.execute(f"""
+        INSERT INTO businesses (name, review_count)
+        SELECT initcap(
+                   ({words})[1 + floor(random() * {len(WORDS)})::int] || ' ' ||
+                   ({words})[1 + floor(random() * {len(WORDS)})::int]
+               ) || ' ' || g,
+               floor(random() * 500)::int
+        FROM generate_series(1, %s) AS g
+    """, (rows,))
+    cur.execute("ANALYZE businesses")
+
+
+def timed(cur, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return min(samples), sorted(samples)[len(samples) // 2]
+
+
+def report(cur, label, repeat):
+    print(f"\n{label}")
+    print(f"{'query':>14} {'ilike min':>10} {'ilike p50':>10}")
+    for q in QUERIES:
+        best, median = timed(
+            cur,
+            "SELECT name FROM businesses WHERE name ILIKE %s ORDER BY review_count DESC LIMIT 21",
+            (f'%{q}%',),
+            repeat
+        )
+        print(f"{q:>14} {best:>10.2f} {median:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    random.seed(0)
+
+    conn = psycopg2.connect(os.environ['LOCAL_DATABASE_URL'])
+    conn.autocommit = True
+    cur = conn.cursor()
+    setup(cur, args.rows)
+
+    try:
+        report(cur, "Without trigram index (sequential scan)", args.repeat)
+
+        started = time.perf_counter()
+        with open(MIGRATION) as f:
+            cur.execute(f.read())
+        cur.execute("ANALYZE businesses")
+        print(f"\nBuilt trigram index in {time.perf_counter() - started:.1f}s")
+
+        report(cur, "With businesses_name_trgm_idx", args.repeat)
+
+        print(f"\n{'query':>14} {'auto min':>10} {'auto p50':>10} {'fuzzy min':>10} {'fuzzy p50':>10}")
+        for q in QUERIES + TYPOS:
+            auto = timed(cur, "SELECT * FROM autocomplete_business_names(%s, 10)", (q,), args.repeat)
+            fuzzy = timed(cur, "SELECT * FROM search_business_ids_fuzzy(%s, 200)", (q,), args.repeat)
+            print(f"{q:>14} {auto[0]:>10.2f} {auto[1]:>10.2f} {fuzzy[0]:>10.2f} {fuzzy[1]:>10.2f}")
+    finally:
+        cur.execute("DROP SCHEMA bench_names CASCADE")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Logins per second per core for password verification through the
+PasswordHasher pool, at the configured (or given) work factor. Runs
+without a database.
+
+    python benchmarks/bench_password_hashing.py --method scrypt:32768:8:1 --logins 200
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from passwords import DEFAULT_METHOD, PasswordHasher, PasswordPoolBusy
+
+
+def run(hasher, password_hash, logins, concurrency):
+    def login(_):
+        while True:
+            try:
+                return hasher.verify(password_hash, 'correct horse battery')
+            except PasswordPoolBusy:
+                time.sleep(0.001)
+
+    hasher.verify(password_hash, 'warm up')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as threads:
+        results = list(threads.map(login, range(logins)))
+    assert all(results)
+    return logins / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--method', default=DEFAULT_METHOD)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    password_hash = PasswordHasher(method=args.method, workers=0).hash('correct horse battery')
+    print(f"method {args.method}, {cores} cores")
+    for workers in sorted({1, max(1, cores // 2), cores}):
+        hasher = PasswordHasher(method=args.method, workers=workers)
+        rate = run(hasher, password_hash, args.logins, args.concurrency)
+        print(f"{workers:3d} workers: {rate:8.1f} logins/s  ({rate / workers:6.1f} per core)")
+
+
+if __name__ == '__main__':
+    main()
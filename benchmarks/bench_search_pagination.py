@@ -0,0 +1,102 @@
+"""
+Compares the old id-only / OFFSET paging against the (boosted_score, id)
+keyset cursor on a synthetic businesses table in a local Postgres.
+
+    LOCAL_DATABASE_URL=postgresql://... python benchmarks/bench_search_pagination.py --rows 500000
+
+Keyset pages should cost the same at page 1 and page 10,000.
+"""
+import argparse
+import os
+import time
+import psycopg2
+
+PAGE_SIZE = 20
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', '003_businesses_search_keyset.sql')
+
+
+def setup(cur, rows):
+    cur.execute("DROP SCHEMA IF EXISTS bench_pagination CASCADE")
+    cur.execute("CREATE SCHEMA bench_pagination")
+    cur.execute("SET search_path TO bench_pagination")
+    cur.execute("""
+        CREATE TABLE businesses (
+            id bigserial PRIMARY KEY,
+            name text NOT NULL,
+            boosted_score double precision NOT NULL
+        )
+    """)
+    cur.execute("""
+        INSERT INTO businesses (name, boosted_score)
+        SELECT 'business ' || g, round((random() * 1000)::numeric, 2)
+        FROM generate_series(1, %s) AS g
+    """, (rows,))
+    with open(MIGRATION) as f:
+        cur.execute(f.read())
+    cur.execute("ANALYZE businesses")
+
+
+def timed(cur, sql, params, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, rows
+
+
+def keyset_cursor_for_page(cur, page):
+    if page == 0:
+        return None
+    cur.execute(
+        "SELECT boosted_score, id FROM businesses ORDER BY boosted_score DESC, id ASC OFFSET %s LIMIT 1",
+        (page * PAGE_SIZE - 1,)
+    )
+    return cur.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pages', type=int, nargs='+', default=[0, 10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['LOCAL_DATABASE_URL'])
+    conn.autocommit = True
+    cur = conn.cursor()
+    setup(cur, args.rows)
+
+    print(f"{'page':>8} {'offset ms':>12} {'keyset ms':>12}")
+    try:
+        for page in args.pages:
+            if page * PAGE_SIZE >= args.rows:
+                continue
+            offset_ms, _ = timed(
+                cur,
+                "SELECT id FROM businesses ORDER BY boosted_score DESC, id ASC OFFSET %s LIMIT %s",
+                (page * PAGE_SIZE, PAGE_SIZE + 1),
+                args.repeat
+            )
+            after = keyset_cursor_for_page(cur, page)
+            if after is None:
+                keyset_sql = "SELECT id FROM businesses ORDER BY boosted_score DESC, id ASC LIMIT %s"
+                keyset_params = (PAGE_SIZE + 1,)
+            else:
+                score, last_id = after
+                keyset_sql = (
+                    "SELECT id FROM businesses "
+                    "WHERE boosted_score < %s OR (boosted_score = %s AND id > %s) "
+                    "ORDER BY boosted_score DESC, id ASC LIMIT %s"
+                )
+                keyset_params = (score, score, last_id, PAGE_SIZE + 1)
+            keyset_ms, _ = timed(cur, keyset_sql, keyset_params, args.repeat)
+            print(f"{page:>8} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+    finally:
+        cur.execute("DROP SCHEMA bench_pagination CASCADE")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,20 +2,27 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from flask_login import login_required, current_user
 from datetime import datetime
 import json
+import base64
+import re
 from werkzeug.utils import secure_filename
 from urllib.parse import urlparse
 import uuid
 from flask import request, current_app
 from flask_login import login_required, current_user
-from sib_api_v3_sdk import Configuration, ApiClient
-from sib_api_v3_sdk.api import TransactionalEmailsApi
-from sib_api_v3_sdk.models import SendSmtpEmail
-from sib_api_v3_sdk.rest import ApiException
 from datetime import datetime
 from datetime import datetime
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import stripe
 import pytz
+from utils import fan_out
+from outbox import enqueue_email
+from emails import email_templates, AppointmentConfirmedEmail
+from subscriptions import subscription_state, store_subscription
+from models import invalidate_user
+from search import invalidate_business_search
+from search_service import name_index
+from leaderboard import leaderboard_service
+from availability import availability
 
 business_bp = Blueprint('business', __name__)
 
@@ -36,23 +43,42 @@ def support():
 @login_required
 def dashboard():
     supabase = current_app.supabase
+    user_id = current_user.id
+
+    # Embed the few business columns the template needs instead of one
+    # lookup per appointment, and let the database drop past dates. The
+    # one-day margin covers businesses whose local date is behind ours.
+    earliest_date = (date.today() - timedelta(days=1)).isoformat()
+
+    calls = {
+        'businesses': lambda: supabase.table('businesses').select('*').eq('user_id', str(user_id)).execute(),
+        'appointments': lambda: supabase.table('appointments') \
+            .select('*, business:business_id(name, category, timezone)') \
+            .eq('user_id', user_id) \
+            .gte('date', earliest_date) \
+            .order('date', desc=False) \
+            .order('time', desc=False) \
+            .execute(),
+    }
+
+    results, errors = fan_out(calls, default_timeout=current_app.config['DASHBOARD_QUERY_TIMEOUT'])
 
-    response = supabase.table('businesses').select('*').eq('user_id', str(current_user.id)).execute()
+    if 'businesses' in errors or 'appointments' in errors:
+        raise errors.get('businesses') or errors['appointments']
+
+    response = results['businesses']
     businesses = response.data if response.data else []
 
-    appointments_resp = supabase.table('appointments').select('*').eq('user_id', current_user.id).execute()
-    appointments = appointments_resp.data or []
+    appointments = results['appointments'].data or []
 
     filtered_appointments = []
 
     for appt in appointments:
-        business_resp = supabase.table('businesses').select('*').eq('id', appt['business_id']).single().execute()
-        business = business_resp.data or {}
-
+        business = appt.get('business') or {}
         appt['business'] = business
 
         appt_datetime_str = f"{appt['date']} {appt['time']}"
-        business_tz_str = business.get('timezone', 'UTC')
+        business_tz_str = business.get('timezone') or 'UTC'
         business_tz = pytz.timezone(business_tz_str)
 
         appt_naive = datetime.strptime(appt_datetime_str, '%Y-%m-%d %H:%M:%S')
@@ -62,15 +88,14 @@ def dashboard():
         if appt_localized >= now_local:
             filtered_appointments.append(appt)
 
-    stripe.api_key = current_app.config['STRIPE_SECRET_KEY']
+    # Subscription state is kept in the users row by stripe_webhook and the
+    # reconcile-subscriptions job. None means it hasn't been synced yet.
     ends_soon = False
     if current_user.stripe_subscription_id:
-        try:
-            subscription = stripe.Subscription.retrieve(current_user.stripe_subscription_id)
-            if subscription.cancel_at_period_end:
-                ends_soon = True
-        except stripe.error.StripeError as e:
-            print(f"Stripe error: {e}")
+        if current_user.subscription_synced_at is None:
+            ends_soon = None
+        else:
+            ends_soon = bool(current_user.subscription_cancel_at_period_end)
 
     return render_template(
         'dashboard.html',
@@ -197,6 +222,9 @@ def create_business():
         }).execute()
 
         if response.data:
+            invalidate_business_search(response.data[0])
+            name_index.update(response.data[0])
+            leaderboard_service.upsert(response.data[0])
             return redirect(url_for('business.dashboard'))
         else:
             flash("Failed to create business. Please try again.", "error")
@@ -394,6 +422,10 @@ def edit_business(business_id):
         update_response = supabase.table('businesses').update(update_data).eq('id', business_id).execute()
 
         if update_response.data:
+            invalidate_business_search(business, update_response.data[0])
+            name_index.update(update_response.data[0])
+            leaderboard_service.upsert(update_response.data[0])
+            availability.invalidate_business(business_id)
             return redirect(url_for('business.view_business', business_id= business_id))
         else:
             flash("Failed to update business. Please try again.", "error")
@@ -482,44 +514,25 @@ def confirm_appointment():
     formatted_date = date_obj.strftime("%B %d, %Y")
     formatted_time = time_obj.strftime("%I:%M %p").lstrip("0")
 
-    html_content = f"""
-    <div style="background-color:#1f1f1f; color:#e0d4ff; font-family:sans-serif; padding:1.5em; border-radius:8px;">
-        <h2 style="color:#b37bff;">Appointment Confirmed 🎉</h2>
-        <p>Hi <strong>{appointment['name']}</strong>,</p>
-        <p>Your appointment with <strong>{business_name}</strong> has been confirmed!</p>
-        <p>
-            <strong>Date:</strong> {formatted_date}<br>
-            <strong>Time:</strong> {formatted_time}
-        </p>
-        <p style="margin-top:1em;">We look forward to seeing you!</p>
-    </div>
-    """
+    subject, html_content = email_templates.render(AppointmentConfirmedEmail(
+        business_name=business_name,
+        name=appointment['name'],
+        date=formatted_date,
+        time=formatted_time
+    ))
 
     try:
-        configuration = Configuration()
-        configuration.api_key['api-key'] = current_app.config['BREVO_API_KEY']
-
-        api_client = ApiClient(configuration)
-        api_instance = TransactionalEmailsApi(api_client)
-
-        send_smtp_email = SendSmtpEmail(
-            to=[{"email": appointment['email'], "name": appointment['name']}],
-            subject=f"Your Appointment with {business_name} is Confirmed",
-            html_content=html_content,
-            sender={"name": "Localate", "email": current_app.config['MAIL_DEFAULT_SENDER']}
+        enqueue_email(
+            appointment['email'],
+            subject,
+            html_content,
+            to_name=appointment['name']
         )
-
-        api_instance.send_transac_email(send_smtp_email)
-
-        return "Appointment confirmed and email sent", 200
-
-    except ApiException as api_err:
-        current_app.logger.error(f"Brevo email sending failed: {api_err}")
-        return "Appointment confirmed, but failed to send confirmation email.", 500
+        return "Appointment confirmed and email queued", 200
 
     except Exception as e:
-        current_app.logger.error(f"Unexpected error in email confirmation: {e}")
-        return "Appointment confirmed, but an unexpected error occurred.", 500
+        current_app.logger.error(f"Failed to queue confirmation email: {e}")
+        return "Appointment confirmed, but failed to send confirmation email.", 500
 
 @business_bp.route('/submit_review/<int:business_id>', methods=['POST'])
 @login_required
@@ -573,33 +586,86 @@ def submit_review(business_id):
         else:
             flash("Something went wrong. Please try again.", "error")
 
-    ratings_resp = supabase.table('reviews')\
-        .select('rating')\
-        .eq('business_id', business_id)\
+    # review_count/avg_rating are maintained by the reviews_aggregate
+    # trigger; read them back only to refresh the caches.
+    business_resp = supabase.table('businesses')\
+        .select('id, name, category, state, review_count, avg_rating')\
+        .eq('id', business_id)\
         .execute()
+    if business_resp.data:
+        invalidate_business_search(business_resp.data[0])
+        name_index.update(business_resp.data[0])
 
-    ratings = [r['rating'] for r in ratings_resp.data]
-    if ratings:
-        avg_rating = sum(ratings) / len(ratings)
-        review_count = len(ratings)
+    return redirect(request.referrer or url_for('search.customer_view', business_id=business_id))
 
-        supabase.table('businesses')\
-            .update({
-                "avg_rating": round(avg_rating, 2),
-                "review_count": review_count
-            })\
-            .eq('id', business_id)\
-            .execute()
+REVIEWS_PER_PAGE = 20
 
-    return redirect(request.referrer or url_for('search.customer_view', business_id=business_id))
+def encode_review_cursor(review):
+    raw = json.dumps([review['created_at'], review['id']], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_review_cursor(cursor):
+    """Returns (created_at, id), or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, review_id = json.loads(raw)
+        # The timestamp is spliced into a PostgREST filter, so allow nothing
+        # but timestamp characters.
+        if not re.fullmatch(r'[0-9T:.+\- ]+', created_at):
+            return None
+        return created_at, int(review_id)
+    except (ValueError, TypeError):
+        return None
+
+def fetch_reviews_page(supabase, business_id, after=None, before=None):
+    """
+    One page of reviews, newest first, keyed on (created_at, id) so every
+    page is an index range scan on reviews_business_created_id_idx no
+    matter how deep it is. `before` walks back towards newer reviews.
+    Returns (reviews, has_more) where has_more is in the walking direction.
+    """
+    newer = before is not None
+    query = supabase.table('reviews')\
+        .select('id, rating, comment, created_at, users(username)')\
+        .eq('business_id', business_id)
+
+    edge = before if newer else after
+    if edge:
+        created_at, review_id = edge
+        op = 'gt' if newer else 'lt'
+        query = query.or_(
+            f'created_at.{op}."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.{op}.{review_id})'
+        )
+
+    response = query\
+        .order('created_at', desc=not newer)\
+        .order('id', desc=not newer)\
+        .limit(REVIEWS_PER_PAGE + 1)\
+        .execute()
+    reviews = response.data or []
+    has_more = len(reviews) > REVIEWS_PER_PAGE
+    reviews = reviews[:REVIEWS_PER_PAGE]
+    if newer:
+        reviews.reverse()
+    return reviews, has_more
 
 @business_bp.route('/business/<int:business_id>/reviews')
 def view_reviews(business_id):
     supabase = current_app.supabase
 
-    reviews_page = int(request.args.get('reviews_page', 1))
-    per_page = 20
-    offset = (reviews_page - 1) * per_page
+    after = decode_review_cursor(request.args.get('after'))
+    before = None if after else decode_review_cursor(request.args.get('before'))
+    try:
+        reviews_page = max(1, int(request.args.get('reviews_page', 1)))
+    except ValueError:
+        reviews_page = 1
+    if not after and not before:
+        reviews_page = 1
+    elif after:
+        reviews_page = max(2, reviews_page)
 
     search_params = {
         'q': request.args.get('q', ''),
@@ -609,56 +675,49 @@ def view_reviews(business_id):
         'page': request.args.get('page', 1)  
     }
 
+    # review_count, avg_rating and the per-star counts are kept current by
+    # the reviews_aggregate trigger, so the page needs no aggregate queries.
     business_response = supabase.table('businesses')\
-        .select('id, name')\
+        .select('id, name, review_count, avg_rating, rating_count_1, rating_count_2, '
+                'rating_count_3, rating_count_4, rating_count_5')\
         .eq('id', business_id)\
         .single()\
         .execute()
-
-    count_response = supabase.table('reviews')\
-        .select('*', count='exact')\
-        .eq('business_id', business_id)\
-        .execute()
-    
-    total_reviews = count_response.count or 0
-    
-    if offset >= total_reviews and total_reviews > 0:
-        reviews_page = 1
-        offset = 0
-    
-    try:
-        reviews_response = supabase.table('reviews')\
-            .select('rating, comment, created_at, users(username)')\
-            .eq('business_id', business_id)\
-            .order('created_at', desc=True)\
-            .range(offset, offset + per_page - 1)\
-            .execute()
-        reviews = reviews_response.data or []
-    except Exception:
-        reviews_response = supabase.table('reviews')\
-            .select('rating, comment, created_at, users(username)')\
-            .eq('business_id', business_id)\
-            .order('created_at', desc=True)\
-            .range(0, per_page - 1)\
-            .execute()
-        reviews = reviews_response.data or []
+    business = business_response.data
+    total_reviews = business.get('review_count') or 0
+    rating_histogram = [
+        {
+            'stars': stars,
+            'count': business.get(f'rating_count_{stars}') or 0,
+            'percent': round(100 * (business.get(f'rating_count_{stars}') or 0) / total_reviews) if total_reviews else 0
+        }
+        for stars in range(5, 0, -1)
+    ]
+
+    reviews, has_more = fetch_reviews_page(supabase, business_id, after=after, before=before)
+    if not before:
+        has_older = has_more
+    elif has_more:
+        has_older = True
+        reviews_page = max(2, reviews_page)
+    else:
+        # Walked back to the newest reviews; show a full first page.
+        reviews, has_older = fetch_reviews_page(supabase, business_id)
         reviews_page = 1
 
-    avg_rating = (
-        sum([r['rating'] for r in reviews]) / len(reviews)
-        if reviews else 0
-    )
-
-    total_pages = (total_reviews + per_page - 1) // per_page
+    total_pages = (total_reviews + REVIEWS_PER_PAGE - 1) // REVIEWS_PER_PAGE
 
     return render_template(
         'view_reviews.html',
-        business=business_response.data,
+        business=business,
         reviews=reviews,
-        avg_rating=round(avg_rating, 1),
+        avg_rating=round(float(business.get('avg_rating') or 0), 1),
         review_count=total_reviews,
-        reviews_page=reviews_page,  
-        total_pages=total_pages,
+        rating_histogram=rating_histogram,
+        reviews_page=reviews_page,
+        total_pages=max(total_pages, reviews_page),
+        newer_cursor=encode_review_cursor(reviews[0]) if reviews and reviews_page > 1 else None,
+        older_cursor=encode_review_cursor(reviews[-1]) if reviews and has_older else None,
         **search_params 
     )
 
@@ -854,9 +913,11 @@ def checkout_success():
 
     supabase = current_app.supabase
     supabase.table('users').update({
+        **subscription_state(session.subscription),
         'is_premium': True,
         'stripe_subscription_id': subscription_id
     }).eq('id', current_user.id).execute()
+    invalidate_user(current_user.id)
 
     return redirect(url_for('business.dashboard'))
 
@@ -874,7 +935,8 @@ def cancel_subscription():
 
     subscription_id = user_resp.data[0]['stripe_subscription_id']
 
-    stripe.Subscription.modify(subscription_id, cancel_at_period_end=True)
+    subscription = stripe.Subscription.modify(subscription_id, cancel_at_period_end=True)
+    store_subscription(supabase, subscription)
 
     return redirect(url_for('business.dashboard'))
 
@@ -903,19 +965,13 @@ def stripe_webhook():
     subscription = event["data"]["object"]
     subscription_id = subscription.get("id")
 
-    if event["type"] == "customer.subscription.deleted":
-
-        supabase.table("users").update({
-            "is_premium": False
-        }).eq("stripe_subscription_id", subscription_id).execute()
-        current_app.logger.info(f"Subscription {subscription_id} ended: set is_premium=False")
-
-    elif event["type"] == "customer.subscription.updated":
-        if subscription.get("status") == "canceled":
-
-            supabase.table("users").update({
-                "is_premium": False
-            }).eq("stripe_subscription_id", subscription_id).execute()
-            current_app.logger.info(f"Subscription {subscription_id} canceled: set is_premium=False")
+    if event["type"] in ("customer.subscription.created",
+                         "customer.subscription.updated",
+                         "customer.subscription.deleted"):
+        store_subscription(supabase, subscription)
+        current_app.logger.info(
+            f"Subscription {subscription_id} is {subscription.get('status')}, "
+            f"cancel_at_period_end={subscription.get('cancel_at_period_end')}"
+        )
 
     return jsonify(success=True)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Every cache created in this process, by name, so their hit/miss counters
+# can be reported together.
+CACHES = {}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else None
+            }
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+class MemoryBackend:
+    """Process-local storage for ResultCache."""
+
+    def __init__(self, name, maxsize, ttl):
+        self.values = TTLCache(name, maxsize=maxsize, ttl=ttl)
+        self.versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl):
+        self.values.set(key, value, ttl=ttl)
+
+    def version(self, scope):
+        return self.versions.get(scope, 0)
+
+    def bump(self, scope):
+        with self._lock:
+            self.versions[scope] = self.versions.get(scope, 0) + 1
+
+
+class RedisBackend:
+    """
+    Shared storage for ResultCache so every gunicorn worker sees the same
+    entries and version bumps. Needs the optional `redis` package.
+    """
+
+    def __init__(self, name, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required when a shared cache URL is configured")
+        self.name = name
+        self.client = redis.Redis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+        CACHES[name] = self
+
+    def get(self, key):
+        raw = self.client.get(f"{self.name}:v:{key}")
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(f"{self.name}:v:{key}", json.dumps(value), ex=max(1, int(ttl)))
+
+    def version(self, scope):
+        return int(self.client.get(f"{self.name}:version:{scope}") or 0)
+
+    def bump(self, scope):
+        self.client.incr(f"{self.name}:version:{scope}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None
+        }
+
+
+class ResultCache:
+    """
+    Short-lived cache of query results. Keys live in a scope, and bumping a
+    scope's version orphans every entry cached under it, so writers don't
+    need to know exactly which keys they affected.
+    """
+
+    def __init__(self, name, maxsize=2048, ttl=30):
+        self.name = name
+        self.ttl = ttl
+        self.backend = MemoryBackend(name, maxsize, ttl)
+
+    def init_app(self, app, url=None, ttl=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if url:
+            self.backend = RedisBackend(self.name, url, self.ttl)
+
+    def _key(self, scope, key):
+        return json.dumps([scope, self.backend.version(scope), key], separators=(',', ':'))
+
+    def get(self, scope, key):
+        return self.backend.get(self._key(scope, key))
+
+    def set(self, scope, key, value):
+        self.backend.set(self._key(scope, key), value, self.ttl)
+
+    def bump(self, *scopes):
+        for scope in set(scopes):
+            self.backend.bump(scope)
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from sib_api_v3_sdk import Configuration, ApiClient
+from sib_api_v3_sdk.api.transactional_emails_api import TransactionalEmailsApi
+
+
+class EmailTransport:
+    """
+    One Brevo client per process. The ApiClient's urllib3 pool manager is
+    thread-safe and keeps connections alive, so sends after the first skip
+    the TLS handshake and no thread pool is created per email.
+    """
+
+    def __init__(self):
+        self.api_key = None
+        self.pool_size = 10
+        self.api = None
+        self.api_client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.sends = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def init_app(self, app):
+        self.api_key = app.config['BREVO_API_KEY']
+        self.pool_size = app.config.get('EMAIL_POOL_SIZE', self.pool_size)
+        app.extensions['email_transport'] = self
+
+    def _client(self):
+        # Built lazily per process so forked gunicorn workers never share
+        # the master's sockets.
+        if self.api is not None and self._pid == os.getpid():
+            return self.api
+        with self._lock:
+            if self.api is None or self._pid != os.getpid():
+                configuration = Configuration()
+                configuration.api_key['api-key'] = self.api_key
+                configuration.connection_pool_maxsize = self.pool_size
+                self.api_client = ApiClient(configuration)
+                self.api = TransactionalEmailsApi(self.api_client)
+                self._pid = os.getpid()
+            return self.api
+
+    def send(self, message):
+        started = time.perf_counter()
+        try:
+            return self._client().send_transac_email(message)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.sends += 1
+                self.total_ms += elapsed
+                self.max_ms = max(self.max_ms, elapsed)
+
+    def _pool_counts(self):
+        connections = requests = 0
+        if self.api_client is None:
+            return connections, requests
+        pools = self.api_client.rest_client.pool_manager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests += pool.num_requests
+        return connections, requests
+
+    def stats(self):
+        connections, requests = self._pool_counts()
+        with self._lock:
+            return {
+                'sends': self.sends,
+                'errors': self.errors,
+                'avg_ms': round(self.total_ms / self.sends, 1) if self.sends else None,
+                'max_ms': round(self.max_ms, 1),
+                # Connections opened vs requests made; a ratio near zero
+                # means keep-alive is doing its job.
+                'connections_opened': connections,
+                'http_requests': requests,
+                'connection_reuse': round(1 - connections / requests, 4) if requests else None
+            }
+
+
+email_transport = EmailTransport()
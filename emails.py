@@ -0,0 +1,122 @@
+import os
+from dataclasses import dataclass, asdict
+from typing import ClassVar, Optional
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates', 'emails')
+
+
+@dataclass
+class ConfirmAccountEmail:
+    template: ClassVar[str] = 'confirm.html'
+    confirm_url: str
+
+    @property
+    def subject(self):
+        return "Please confirm your email"
+
+
+@dataclass
+class PasswordResetEmail:
+    template: ClassVar[str] = 'password_reset.html'
+    reset_url: str
+
+    @property
+    def subject(self):
+        return "Reset Your Password"
+
+
+@dataclass
+class AppointmentBookedEmail:
+    template: ClassVar[str] = 'appointment_booked.html'
+    business_name: str
+    name: str
+    email: str
+    phone: str
+    date: str
+    time: str
+    calendar_url: Optional[str] = None
+
+    @property
+    def subject(self):
+        return f"New Appointment for {self.business_name}"
+
+
+@dataclass
+class AppointmentCanceledEmail:
+    template: ClassVar[str] = 'appointment_canceled.html'
+    business_name: str
+    name: str
+    email: str
+    phone: str
+    date: str
+    time: str
+
+    @property
+    def subject(self):
+        return f"Appointment Canceled for {self.business_name}"
+
+
+@dataclass
+class AppointmentConfirmedEmail:
+    template: ClassVar[str] = 'appointment_confirmed.html'
+    business_name: str
+    name: str
+    date: str
+    time: str
+
+    @property
+    def subject(self):
+        return f"Your Appointment with {self.business_name} is Confirmed"
+
+
+EMAILS = (
+    ConfirmAccountEmail,
+    PasswordResetEmail,
+    AppointmentBookedEmail,
+    AppointmentCanceledEmail,
+    AppointmentConfirmedEmail
+)
+
+
+class EmailTemplates:
+    """
+    Transactional email templates, compiled once at startup. The bytecode
+    cache on disk lets later processes skip parsing altogether, and
+    auto_reload is off so a render never stats the template files.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.env = None
+        self.templates = {}
+        self.cache_dir = cache_dir
+
+    def init_app(self, app=None):
+        cache_dir = self.cache_dir
+        if app is not None:
+            cache_dir = app.config.get('EMAIL_TEMPLATE_CACHE_DIR') or cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        else:
+            # Jinja's own default is a per-user 0700 directory whose owner it
+            # checks; a shared temp path could be pre-seeded with bytecode.
+            bytecode_cache = FileSystemBytecodeCache()
+        self.env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(['html']),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False
+        )
+        self.templates = {email.template: self.env.get_template(email.template) for email in EMAILS}
+        if app is not None:
+            app.extensions['email_templates'] = self
+
+    def render(self, email):
+        """Returns (subject, html) for one of the EMAILS dataclasses."""
+        if not self.templates:
+            self.init_app()
+        return email.subject, self.templates[email.template].render(asdict(email))
+
+
+email_templates = EmailTemplates()
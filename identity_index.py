@@ -0,0 +1,152 @@
+"""
+Which usernames and emails are taken, answered from a Bloom filter first.
+
+A miss in the filter means nobody had the name when it was last loaded, so
+most availability checks never reach the database. A hit may be a false
+positive and is confirmed with one query. The filter can lag behind users
+created by other workers until the next rebuild, so the unique constraints
+on users remain what actually decides a signup. Both ignore case: keys
+are lower-cased here and matched against users.username_key/email_key.
+"""
+import os
+import re
+import threading
+from bloom import BloomFilter
+
+IDENTITY_FIELDS = ('username', 'email')
+
+# Postgres names the violated constraint in the message and the column in
+# the details ('Key (username)=(...) already exists.'); the values
+# themselves are user input and must not be searched.
+_CONSTRAINT_RE = re.compile(r'"users_(username|email)(?:_lower)?_key"')
+_KEY_RE = re.compile(r'^Key \((username|email)(?:_key)?\)=')
+
+
+def identity_key(field, value):
+    return f"{field}:{value.strip().lower()}"
+
+
+def conflicting_field(message, details):
+    """'username' or 'email' for a unique violation on users, else None."""
+    match = _CONSTRAINT_RE.search(message or '') or _KEY_RE.match(details or '')
+    return match.group(1) if match else None
+
+
+class IdentityIndex:
+    def __init__(self, error_rate=0.01):
+        self.error_rate = error_rate
+        self.filter = BloomFilter(10000, error_rate)
+        self.ready = False
+        self.supabase = None
+        self.logger = None
+        self.refresh_interval = 600
+        self.lookups = 0
+        self.short_circuits = 0
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.supabase = app.supabase
+        self.logger = app.logger
+        self.refresh_interval = app.config.get('IDENTITY_INDEX_REFRESH_INTERVAL', self.refresh_interval)
+        app.extensions['identity_index'] = self
+        self.ensure_started()
+
+    def ensure_started(self):
+        # Threads don't survive gunicorn's fork, so each worker starts its own.
+        if self.supabase is None:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='identity-index', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Could not load identity index: {e}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def rebuild(self, batch_size=1000):
+        rows = []
+        last_id = 0
+        while True:
+            response = self.supabase.table('users') \
+                .select('id, username, email') \
+                .gt('id', last_id) \
+                .order('id', desc=False) \
+                .limit(batch_size) \
+                .execute()
+            batch = response.data or []
+            rows.extend(batch)
+            if len(batch) < batch_size:
+                break
+            last_id = batch[-1]['id']
+        self.build(rows)
+
+    def build(self, rows):
+        # Leave room to grow so inserts between rebuilds keep the error rate.
+        bloom = BloomFilter(max(len(rows) * 2, 10000), self.error_rate)
+        for row in rows:
+            for field in IDENTITY_FIELDS:
+                if row.get(field):
+                    bloom.add(identity_key(field, row[field]))
+        with self._lock:
+            self.filter = bloom
+            self.ready = True
+
+    def add(self, username=None, email=None):
+        with self._lock:
+            if username:
+                self.filter.add(identity_key('username', username))
+            if email:
+                self.filter.add(identity_key('email', email))
+
+    def might_exist(self, field, value):
+        """False means definitely free as of the last load; True means check."""
+        self.ensure_started()
+        self.lookups += 1
+        if not self.ready:
+            return True
+        with self._lock:
+            present = identity_key(field, value) in self.filter
+        if not present:
+            self.short_circuits += 1
+        return present
+
+    def find(self, field, value, use_filter=True):
+        """
+        The matching users row ({'id', 'confirmed'}) or None. Pass
+        use_filter=False when the database is already known to have it.
+        """
+        if field not in IDENTITY_FIELDS:
+            raise ValueError(f"Unknown identity field: {field}")
+        if use_filter and not self.might_exist(field, value):
+            return None
+        response = self.supabase.table('users') \
+            .select('id, confirmed') \
+            .eq(f"{field}_key", value.strip().lower()) \
+            .limit(1) \
+            .execute()
+        return response.data[0] if response.data else None
+
+    def stats(self):
+        return {
+            'ready': self.ready,
+            'entries': self.filter.count,
+            'lookups': self.lookups,
+            'short_circuits': self.short_circuits
+        }
+
+
+identity_index = IdentityIndex()
@@ -0,0 +1,253 @@
+"""
+Trophy leaderboards served from memory.
+
+Every business loaded in this process sits in an overall board, a board
+for its state and one for its city, each a sorted list of
+(-trophies, id). Pages are slices and ranks are a bisect, so neither
+touches the database; toggles update the boards in place and a periodic
+rebuild picks up writes made by other workers.
+"""
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from cache import TTLCache
+
+
+class Board:
+    def __init__(self):
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, business_id, trophies):
+        insort(self.keys, (-trophies, business_id))
+
+    def remove(self, business_id, trophies):
+        key = (-trophies, business_id)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+
+    def rank(self, trophies):
+        """1 + the number of businesses with more trophies; ties share a rank."""
+        return bisect_left(self.keys, (-trophies,)) + 1
+
+    def page(self, offset, limit):
+        return [business_id for _, business_id in self.keys[offset:offset + limit]]
+
+
+def trophies_keyset_filter(trophies, last_id):
+    """
+    PostgREST filter for the businesses after (trophies, last_id) in
+    leaderboard order, counting NULL trophies as 0 like the boards do.
+    """
+    keyset = f"trophies.lt.{trophies},and(trophies.eq.{trophies},id.gt.{last_id})"
+    if trophies > 0:
+        return f"{keyset},trophies.is.null"
+    return f"{keyset},and(trophies.is.null,id.gt.{last_id})"
+
+
+def _city_key(city):
+    return ' '.join(city.lower().split()) if city else None
+
+
+class LeaderboardService:
+    def __init__(self):
+        self.businesses = {}
+        self.overall = Board()
+        self.states = {}
+        self.cities = {}
+        self.ready = False
+        self.version = 0
+        # City filters match substrings, so one filter can span several city
+        # boards; their merged order is kept until the next change.
+        self.merged = TTLCache('leaderboard-merged', maxsize=256, ttl=300)
+        self.supabase = None
+        self.logger = None
+        self.refresh_interval = 300
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.supabase = app.supabase
+        self.logger = app.logger
+        self.refresh_interval = app.config.get('LEADERBOARD_REFRESH_INTERVAL', self.refresh_interval)
+        app.extensions['leaderboard'] = self
+        self.ensure_started()
+
+    def ensure_started(self):
+        # Threads don't survive gunicorn's fork, so each worker starts its own.
+        if self.supabase is None:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='leaderboard', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Could not load leaderboard: {e}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def rebuild(self, batch_size=1000):
+        rows = []
+        last_id = 0
+        while True:
+            response = self.supabase.table('businesses') \
+                .select('id, name, trophies, city, state') \
+                .gt('id', last_id) \
+                .order('id', desc=False) \
+                .limit(batch_size) \
+                .execute()
+            batch = response.data or []
+            rows.extend(batch)
+            if len(batch) < batch_size:
+                break
+            last_id = batch[-1]['id']
+        self.build(rows)
+
+    def build(self, rows):
+        businesses = {}
+        overall = Board()
+        states = {}
+        cities = {}
+        for row in rows:
+            business = {
+                'id': row['id'],
+                'name': row.get('name'),
+                'trophies': row.get('trophies') or 0,
+                'city': row.get('city'),
+                'state': row.get('state')
+            }
+            businesses[business['id']] = business
+            key = (-business['trophies'], business['id'])
+            overall.keys.append(key)
+            for boards, scope in self._scopes(business, states, cities):
+                boards.setdefault(scope, Board()).keys.append(key)
+        overall.keys.sort()
+        for board in list(states.values()) + list(cities.values()):
+            board.keys.sort()
+        with self._lock:
+            self.businesses = businesses
+            self.overall = overall
+            self.states = states
+            self.cities = cities
+            self.version += 1
+            self.ready = True
+
+    def _scopes(self, business, states=None, cities=None):
+        states = self.states if states is None else states
+        cities = self.cities if cities is None else cities
+        scopes = []
+        if business['state']:
+            scopes.append((states, business['state']))
+        if business['city']:
+            scopes.append((cities, (business['state'], _city_key(business['city']))))
+        return scopes
+
+    def _boards(self, business):
+        boards = [self.overall]
+        for boards_by_scope, scope in self._scopes(business):
+            boards.append(boards_by_scope.setdefault(scope, Board()))
+        return boards
+
+    def upsert(self, business):
+        """Add or move a business after a write; missing fields keep their value."""
+        if not self.ready or not business or 'id' not in business:
+            return
+        with self._lock:
+            existing = self.businesses.get(business['id'])
+            if existing is not None:
+                for board in self._boards(existing):
+                    board.remove(existing['id'], existing['trophies'])
+            merged = dict(existing or {'name': None, 'trophies': 0, 'city': None, 'state': None})
+            merged.update({k: business[k] for k in ('id', 'name', 'trophies', 'city', 'state') if k in business})
+            merged['trophies'] = merged['trophies'] or 0
+            self.businesses[merged['id']] = merged
+            for board in self._boards(merged):
+                board.add(merged['id'], merged['trophies'])
+            self.version += 1
+
+    def update_trophies(self, business_id, trophies):
+        # Businesses created by another worker arrive with the next rebuild,
+        # along with their name and location.
+        if business_id in self.businesses:
+            self.upsert({'id': business_id, 'trophies': trophies})
+
+    def remove(self, business_id):
+        with self._lock:
+            existing = self.businesses.pop(business_id, None)
+            if existing is not None:
+                for board in self._boards(existing):
+                    board.remove(existing['id'], existing['trophies'])
+                self.version += 1
+
+    def _keys(self, city, state):
+        if not city:
+            board = self.states.get(state) if state else self.overall
+            return board.keys if board else []
+
+        needle = _city_key(city)
+        cache_key = (self.version, needle, state)
+        keys = self.merged.get(cache_key)
+        if keys is None:
+            boards = [
+                board for (board_state, board_city), board in self.cities.items()
+                if needle in board_city and (not state or board_state == state)
+            ]
+            keys = boards[0].keys if len(boards) == 1 else list(merge(*(b.keys for b in boards)))
+            self.merged.set(cache_key, keys)
+        return keys
+
+    def page(self, city=None, state=None, offset=0, limit=20, after=None):
+        """
+        Returns (rows, total), or None until the boards have been loaded.
+        `after` is the (trophies, id) of the last row already shown and
+        takes precedence over offset.
+        """
+        self.ensure_started()
+        if not self.ready:
+            return None
+        with self._lock:
+            keys = self._keys(city, state)
+            if after is not None:
+                offset = bisect_right(keys, (-after[0], after[1]))
+            rows = []
+            for position, (_, business_id) in enumerate(keys[offset:offset + limit], start=offset + 1):
+                row = dict(self.businesses[business_id])
+                row['rank'] = position
+                rows.append(row)
+            return rows, len(keys)
+
+    def rank(self, business_id):
+        """The business's rank overall, in its state and in its city."""
+        self.ensure_started()
+        if not self.ready:
+            return None
+        with self._lock:
+            business = self.businesses.get(business_id)
+            if business is None:
+                return None
+            trophies = business['trophies']
+            ranks = {'overall': self.overall.rank(trophies), 'state': None, 'city': None}
+            if business['state']:
+                ranks['state'] = self.states[business['state']].rank(trophies)
+            if business['city']:
+                ranks['city'] = self.cities[(business['state'], _city_key(business['city']))].rank(trophies)
+            return ranks
+
+
+leaderboard_service = LeaderboardService()
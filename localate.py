@@ -3,11 +3,25 @@ from dotenv import load_dotenv
 from flask import Flask
 from supabase import create_client
 from extensions import login_manager, mail
+from analytics import analytics_buffer
 from auth import auth_bp
 from business import business_bp
-from search import search_bp
+from search import search_bp, search_cache
+from search_service import name_index
+from leaderboard import leaderboard_service
 from flask import render_template
 from users import user_bp
+import subscriptions
+import outbox
+import reviews
+from email_transport import email_transport
+from emails import email_templates
+from recaptcha import recaptcha
+from passwords import password_hasher
+from identity_index import identity_index
+from models import user_cache
+from cache import cache_stats
+from flask import jsonify, abort
 
 load_dotenv()
 
@@ -19,19 +33,50 @@ def create_app():
     app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
     app.config['BREVO_API_KEY'] = os.getenv('BREVO_API_KEY')
+    app.config['EMAIL_POOL_SIZE'] = int(os.getenv('EMAIL_POOL_SIZE', 10))
+    app.config['EMAIL_TEMPLATE_CACHE_DIR'] = os.getenv('EMAIL_TEMPLATE_CACHE_DIR')
+    app.config['RECAPTCHA_SECRET_KEY'] = os.getenv('RECAPTCHA_SECRET_KEY')
+    app.config['RECAPTCHA_BACKEND'] = os.getenv('RECAPTCHA_BACKEND', 'google')
+    app.config['RECAPTCHA_CONNECT_TIMEOUT'] = float(os.getenv('RECAPTCHA_CONNECT_TIMEOUT', 2))
+    app.config['RECAPTCHA_READ_TIMEOUT'] = float(os.getenv('RECAPTCHA_READ_TIMEOUT', 3))
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD')
+    app.config['PASSWORD_POOL_SIZE'] = int(os.getenv('PASSWORD_POOL_SIZE') or (os.cpu_count() or 1))
+    app.config['PASSWORD_POOL_MAX_PENDING'] = int(os.getenv('PASSWORD_POOL_MAX_PENDING') or 0)
     app.config['STRIPE_PUBLISHABLE_KEY'] = os.getenv('STRIPE_PUBLISHABLE_KEY')
     app.config['STRIPE_SECRET_KEY'] = os.getenv('STRIPE_SECRET_KEY')
     app.config['STRIPE_PRODUCT_ID'] = os.getenv('STRIPE_PRODUCT_ID')
     app.config['STRIPE_WEBHOOK_SECRET'] = os.getenv('STRIPE_WEBHOOK_SECRET')
+    app.config['DASHBOARD_QUERY_TIMEOUT'] = float(os.getenv('DASHBOARD_QUERY_TIMEOUT', 10))
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 60))
+    app.config['EXPOSE_CACHE_STATS'] = os.getenv('EXPOSE_CACHE_STATS', 'false').lower() == 'true'
+    app.config['SEARCH_CACHE_TTL'] = int(os.getenv('SEARCH_CACHE_TTL', 30))
+    app.config['SEARCH_CACHE_URL'] = os.getenv('SEARCH_CACHE_URL')
+    app.config['AUTOCOMPLETE_REFRESH_INTERVAL'] = int(os.getenv('AUTOCOMPLETE_REFRESH_INTERVAL', 600))
+    app.config['LEADERBOARD_REFRESH_INTERVAL'] = int(os.getenv('LEADERBOARD_REFRESH_INTERVAL', 300))
+    app.config['IDENTITY_INDEX_REFRESH_INTERVAL'] = int(os.getenv('IDENTITY_INDEX_REFRESH_INTERVAL', 600))
+    app.config['ANALYTICS_FLUSH_INTERVAL'] = int(os.getenv('ANALYTICS_FLUSH_INTERVAL', 10))
 
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = "You must be logged in to access this feature."
     mail.init_app(app)
+    recaptcha.init_app(app)
+    password_hasher.init_app(app)
+    user_cache.ttl = app.config['USER_CACHE_TTL']
 
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
     app.supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    analytics_buffer.init_app(app)
+    subscriptions.init_app(app)
+    email_transport.init_app(app)
+    email_templates.init_app(app)
+    outbox.init_app(app)
+    reviews.init_app(app)
+    search_cache.init_app(app, url=app.config['SEARCH_CACHE_URL'], ttl=app.config['SEARCH_CACHE_TTL'])
+    name_index.init_app(app)
+    leaderboard_service.init_app(app)
+    identity_index.init_app(app)
 
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(business_bp, url_prefix='/business')
@@ -41,6 +86,19 @@ def create_app():
     @app.route('/')
     def index():
         return render_template('index.html')
+
+    @app.route('/metrics/cache')
+    def metrics_cache():
+        # Per-process numbers; each gunicorn worker reports its own.
+        if not app.config['EXPOSE_CACHE_STATS']:
+            abort(404)
+        return jsonify(cache_stats())
+
+    @app.route('/metrics/recaptcha')
+    def metrics_recaptcha():
+        if not app.config['EXPOSE_CACHE_STATS']:
+            abort(404)
+        return jsonify(recaptcha.stats())
     return app
 
 if __name__ == "__main__":
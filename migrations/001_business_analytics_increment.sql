@@ -0,0 +1,65 @@
+-- Atomic upsert-and-increment for business_analytics.
+--
+-- record_analytics used to SELECT today's row and write back row[field] + 1,
+-- which loses increments under concurrent traffic. These functions do the
+-- whole thing in one statement, relying on a unique (business_id, date) key.
+
+-- Fold any duplicate rows left behind by the old read-modify-write path
+-- into the oldest row before adding the constraint.
+WITH totals AS (
+    SELECT MIN(id) AS keep_id,
+           business_id,
+           date,
+           SUM(profile_views) AS profile_views,
+           SUM(search_appearances) AS search_appearances
+    FROM business_analytics
+    GROUP BY business_id, date
+    HAVING COUNT(*) > 1
+)
+UPDATE business_analytics ba
+SET profile_views = totals.profile_views,
+    search_appearances = totals.search_appearances
+FROM totals
+WHERE ba.id = totals.keep_id;
+
+DELETE FROM business_analytics ba
+USING business_analytics other
+WHERE ba.business_id = other.business_id
+  AND ba.date = other.date
+  AND ba.id > other.id;
+
+ALTER TABLE business_analytics
+    ADD CONSTRAINT business_analytics_business_id_date_key UNIQUE (business_id, date);
+
+CREATE OR REPLACE FUNCTION increment_business_analytics(
+    p_business_id bigint,
+    p_date date,
+    p_profile_views integer DEFAULT 0,
+    p_search_appearances integer DEFAULT 0
+) RETURNS void
+LANGUAGE sql
+AS $$
+    INSERT INTO business_analytics (business_id, date, profile_views, search_appearances)
+    VALUES (p_business_id, p_date, p_profile_views, p_search_appearances)
+    ON CONFLICT (business_id, date) DO UPDATE
+    SET profile_views = business_analytics.profile_views + EXCLUDED.profile_views,
+        search_appearances = business_analytics.search_appearances + EXCLUDED.search_appearances;
+$$;
+
+-- Bulk variant used by the in-process AnalyticsBuffer. p_rows is a JSON array
+-- of {"business_id", "date", "profile_views", "search_appearances"} objects.
+CREATE OR REPLACE FUNCTION increment_business_analytics_bulk(p_rows jsonb)
+RETURNS void
+LANGUAGE sql
+AS $$
+    INSERT INTO business_analytics (business_id, date, profile_views, search_appearances)
+    SELECT (r->>'business_id')::bigint,
+           (r->>'date')::date,
+           SUM(COALESCE((r->>'profile_views')::integer, 0)),
+           SUM(COALESCE((r->>'search_appearances')::integer, 0))
+    FROM jsonb_array_elements(p_rows) AS r
+    GROUP BY 1, 2
+    ON CONFLICT (business_id, date) DO UPDATE
+    SET profile_views = business_analytics.profile_views + EXCLUDED.profile_views,
+        search_appearances = business_analytics.search_appearances + EXCLUDED.search_appearances;
+$$;
@@ -0,0 +1,13 @@
+-- Local copy of each user's Stripe subscription state, written by the
+-- webhook and the reconcile-subscriptions job, so the dashboard doesn't
+-- have to call Stripe on every render.
+
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS subscription_status text,
+    ADD COLUMN IF NOT EXISTS subscription_cancel_at_period_end boolean NOT NULL DEFAULT false,
+    ADD COLUMN IF NOT EXISTS subscription_current_period_end timestamptz,
+    ADD COLUMN IF NOT EXISTS subscription_synced_at timestamptz;
+
+CREATE INDEX IF NOT EXISTS users_subscription_synced_at_idx
+    ON users (subscription_synced_at)
+    WHERE stripe_subscription_id IS NOT NULL;
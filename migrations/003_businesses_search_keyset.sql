@@ -0,0 +1,10 @@
+-- Composite indexes backing the (boosted_score, id) keyset cursor used by
+-- search() and load_more(). "Most popular" sorts boosted_score DESC, id ASC
+-- and "least popular" sorts both ascending; mixed directions can't share one
+-- index, so each order gets its own.
+
+CREATE INDEX IF NOT EXISTS businesses_boosted_score_desc_id_idx
+    ON businesses (boosted_score DESC, id ASC);
+
+CREATE INDEX IF NOT EXISTS businesses_boosted_score_asc_id_idx
+    ON businesses (boosted_score ASC, id ASC);
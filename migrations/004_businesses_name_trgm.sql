@@ -0,0 +1,61 @@
+-- Trigram index and ranked/fuzzy lookups for business names.
+--
+-- A leading-wildcard ILIKE can't use a B-tree index. With a pg_trgm GIN
+-- index the same '%query%' ILIKE is index-assisted, and the <% operator
+-- gives typo-tolerant matching off the same index.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS businesses_name_trgm_idx
+    ON businesses USING gin (name gin_trgm_ops);
+
+-- Escape LIKE metacharacters so user input is matched literally.
+CREATE OR REPLACE FUNCTION business_name_like_pattern(p_query text)
+RETURNS text
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT '%' || replace(replace(replace(p_query, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+$$;
+
+-- Ids of businesses whose name is a close (possibly misspelt) match,
+-- best match first. Used when a substring search finds nothing.
+CREATE OR REPLACE FUNCTION search_business_ids_fuzzy(p_query text, p_limit integer DEFAULT 200)
+RETURNS TABLE (id bigint, score real)
+LANGUAGE sql STABLE
+AS $$
+    SELECT b.id::bigint, word_similarity(p_query, b.name) AS score
+    FROM businesses b
+    WHERE p_query <% b.name
+    ORDER BY score DESC, b.id
+    LIMIT p_limit;
+$$;
+
+-- Substring matches by review_count, topped up with fuzzy matches when
+-- there are fewer than p_limit of them.
+CREATE OR REPLACE FUNCTION autocomplete_business_names(p_query text, p_limit integer DEFAULT 10)
+RETURNS TABLE (name text, review_count integer)
+LANGUAGE plpgsql STABLE
+AS $$
+DECLARE
+    pattern text := business_name_like_pattern(p_query);
+    found integer;
+BEGIN
+    RETURN QUERY
+        SELECT b.name::text, b.review_count::integer
+        FROM businesses b
+        WHERE b.name ILIKE pattern
+        ORDER BY b.review_count DESC NULLS LAST
+        LIMIT p_limit;
+    GET DIAGNOSTICS found = ROW_COUNT;
+
+    IF found < p_limit THEN
+        RETURN QUERY
+            SELECT b.name::text, b.review_count::integer
+            FROM businesses b
+            WHERE p_query <% b.name
+              AND b.name NOT ILIKE pattern
+            ORDER BY word_similarity(p_query, b.name) DESC, b.review_count DESC NULLS LAST
+            LIMIT p_limit - found;
+    END IF;
+END;
+$$;
@@ -0,0 +1,25 @@
+-- One appointment per (business, date, time). book_appointment inserts
+-- directly and treats a unique violation (23505) as "slot taken", so two
+-- concurrent bookings can no longer both pass a SELECT check.
+
+-- Double bookings made before this constraint have to be resolved by hand
+-- (contact the customers, then delete one of each pair). Refuse to run
+-- until they are gone rather than silently dropping appointments.
+DO $$
+DECLARE
+    duplicates integer;
+BEGIN
+    SELECT count(*) INTO duplicates
+    FROM (
+        SELECT 1 FROM appointments
+        GROUP BY business_id, date, time
+        HAVING count(*) > 1
+    ) d;
+    IF duplicates > 0 THEN
+        RAISE EXCEPTION '% double-booked slots in appointments; resolve them before adding the unique index', duplicates;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS appointments_business_slot_key
+    ON appointments (business_id, date, time);
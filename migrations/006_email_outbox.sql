@@ -0,0 +1,46 @@
+-- Durable queue of transactional emails. Request handlers insert a row and
+-- return; the `flask send-emails` worker claims batches, sends them through
+-- Brevo and records the outcome.
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id bigserial PRIMARY KEY,
+    to_email text NOT NULL,
+    to_name text,
+    subject text NOT NULL,
+    html_content text NOT NULL,
+    sender_email text NOT NULL,
+    sender_name text,
+    status text NOT NULL DEFAULT 'pending',   -- pending | sent | failed
+    attempts integer NOT NULL DEFAULT 0,
+    next_attempt_at timestamptz NOT NULL DEFAULT now(),
+    locked_until timestamptz,
+    last_error text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    sent_at timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS email_outbox_pending_idx
+    ON email_outbox (next_attempt_at)
+    WHERE status = 'pending';
+
+-- Claim up to p_batch due emails for p_lease_seconds. A worker that dies
+-- mid-batch simply lets the lease lapse and the rows are claimed again,
+-- so nothing is lost (at worst an email is sent twice).
+CREATE OR REPLACE FUNCTION claim_email_outbox(p_batch integer DEFAULT 50, p_lease_seconds integer DEFAULT 120)
+RETURNS SETOF email_outbox
+LANGUAGE sql
+AS $$
+    UPDATE email_outbox
+    SET locked_until = now() + make_interval(secs => p_lease_seconds),
+        attempts = attempts + 1
+    WHERE id IN (
+        SELECT id FROM email_outbox
+        WHERE status = 'pending'
+          AND next_attempt_at <= now()
+          AND (locked_until IS NULL OR locked_until < now())
+        ORDER BY next_attempt_at
+        LIMIT p_batch
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$;
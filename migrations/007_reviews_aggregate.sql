@@ -0,0 +1,116 @@
+-- Keep businesses.review_count / avg_rating up to date from the reviews
+-- table itself. Each review write applies its delta to a running
+-- rating_sum in one UPDATE, which row-locks the business, so concurrent
+-- reviews serialize on that row instead of racing a read-recompute-write
+-- in the app. reconcile_review_aggregates() checks the result.
+
+BEGIN;
+
+ALTER TABLE businesses
+    ADD COLUMN IF NOT EXISTS rating_sum bigint NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_review_aggregate(p_business_id bigint, p_sum_delta bigint, p_count_delta integer)
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE businesses
+    SET rating_sum = rating_sum + p_sum_delta,
+        review_count = coalesce(review_count, 0) + p_count_delta,
+        avg_rating = CASE
+            WHEN coalesce(review_count, 0) + p_count_delta > 0
+            THEN round((rating_sum + p_sum_delta)::numeric / (coalesce(review_count, 0) + p_count_delta), 2)
+            ELSE 0
+        END
+    WHERE id = p_business_id;
+$$;
+
+CREATE OR REPLACE FUNCTION reviews_apply_aggregate()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.business_id = OLD.business_id THEN
+        IF NEW.rating IS DISTINCT FROM OLD.rating THEN
+            PERFORM bump_review_aggregate(NEW.business_id, NEW.rating - OLD.rating, 0);
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_review_aggregate(OLD.business_id, -OLD.rating, -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        PERFORM bump_review_aggregate(NEW.business_id, NEW.rating, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS reviews_aggregate ON reviews;
+CREATE TRIGGER reviews_aggregate
+    AFTER INSERT OR UPDATE OF rating, business_id OR DELETE ON reviews
+    FOR EACH ROW EXECUTE FUNCTION reviews_apply_aggregate();
+
+-- Writes are blocked until COMMIT, so the backfill and the trigger see
+-- the same set of reviews.
+LOCK TABLE reviews IN SHARE MODE;
+
+UPDATE businesses b
+SET rating_sum = agg.rating_sum,
+    review_count = agg.review_count,
+    avg_rating = CASE WHEN agg.review_count > 0 THEN round(agg.rating_sum::numeric / agg.review_count, 2) ELSE 0 END
+FROM (
+    SELECT b2.id, coalesce(sum(r.rating), 0) AS rating_sum, count(r.rating) AS review_count
+    FROM businesses b2
+    LEFT JOIN reviews r ON r.business_id = b2.id
+    GROUP BY b2.id
+) agg
+WHERE agg.id = b.id;
+
+COMMIT;
+
+-- Businesses whose stored aggregate disagrees with their reviews. With
+-- p_fix each one is locked, recounted and corrected; holding the business
+-- row means a review committing meanwhile applies its delta after the fix.
+CREATE OR REPLACE FUNCTION reconcile_review_aggregates(p_fix boolean DEFAULT false)
+RETURNS TABLE (business_id bigint, stored_sum bigint, stored_count integer, actual_sum bigint, actual_count integer)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    drifted record;
+BEGIN
+    FOR drifted IN
+        SELECT b.id::bigint AS id
+        FROM businesses b
+        LEFT JOIN (
+            SELECT r.business_id, sum(r.rating) AS rating_sum, count(*) AS review_count
+            FROM reviews r
+            GROUP BY r.business_id
+        ) agg ON agg.business_id = b.id
+        WHERE b.rating_sum <> coalesce(agg.rating_sum, 0)
+           OR coalesce(b.review_count, 0) <> coalesce(agg.review_count, 0)
+    LOOP
+        IF p_fix THEN
+            PERFORM 1 FROM businesses b WHERE b.id = drifted.id FOR UPDATE;
+        END IF;
+        SELECT b.id::bigint, b.rating_sum, coalesce(b.review_count, 0)::integer,
+               coalesce(sum(r.rating), 0)::bigint, count(r.rating)::integer
+        INTO business_id, stored_sum, stored_count, actual_sum, actual_count
+        FROM businesses b
+        LEFT JOIN reviews r ON r.business_id = b.id
+        WHERE b.id = drifted.id
+        GROUP BY b.id;
+        IF stored_sum = actual_sum AND stored_count = actual_count THEN
+            CONTINUE;
+        END IF;
+        IF p_fix THEN
+            UPDATE businesses b
+            SET rating_sum = actual_sum,
+                review_count = actual_count,
+                avg_rating = CASE WHEN actual_count > 0 THEN round(actual_sum::numeric / actual_count, 2) ELSE 0 END
+            WHERE b.id = drifted.id;
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
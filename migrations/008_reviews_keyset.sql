@@ -0,0 +1,6 @@
+-- Backs the (created_at, id) keyset cursor in view_reviews: each page is a
+-- range scan starting at the cursor, so deep pages cost the same as the
+-- first one.
+
+CREATE INDEX IF NOT EXISTS reviews_business_created_id_idx
+    ON reviews (business_id, created_at DESC, id DESC);
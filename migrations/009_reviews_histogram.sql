@@ -0,0 +1,151 @@
+-- Per-star review counts on businesses, maintained by the same trigger as
+-- rating_sum/review_count, so the reviews page can draw its distribution
+-- bars from the business row alone.
+
+BEGIN;
+
+ALTER TABLE businesses
+    ADD COLUMN IF NOT EXISTS rating_count_1 integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_count_2 integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_count_3 integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_count_4 integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rating_count_5 integer NOT NULL DEFAULT 0;
+
+-- Moves one review from p_old_rating to p_new_rating; NULL on either side
+-- means the review is being added or removed.
+CREATE OR REPLACE FUNCTION apply_review_change(p_business_id bigint, p_old_rating integer, p_new_rating integer)
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE businesses
+    SET rating_sum = rating_sum + coalesce(p_new_rating, 0) - coalesce(p_old_rating, 0),
+        review_count = coalesce(review_count, 0) + (p_new_rating IS NOT NULL)::int - (p_old_rating IS NOT NULL)::int,
+        avg_rating = CASE
+            WHEN coalesce(review_count, 0) + (p_new_rating IS NOT NULL)::int - (p_old_rating IS NOT NULL)::int > 0
+            THEN round(
+                (rating_sum + coalesce(p_new_rating, 0) - coalesce(p_old_rating, 0))::numeric
+                / (coalesce(review_count, 0) + (p_new_rating IS NOT NULL)::int - (p_old_rating IS NOT NULL)::int),
+                2
+            )
+            ELSE 0
+        END,
+        rating_count_1 = rating_count_1 + (p_new_rating IS NOT DISTINCT FROM 1)::int - (p_old_rating IS NOT DISTINCT FROM 1)::int,
+        rating_count_2 = rating_count_2 + (p_new_rating IS NOT DISTINCT FROM 2)::int - (p_old_rating IS NOT DISTINCT FROM 2)::int,
+        rating_count_3 = rating_count_3 + (p_new_rating IS NOT DISTINCT FROM 3)::int - (p_old_rating IS NOT DISTINCT FROM 3)::int,
+        rating_count_4 = rating_count_4 + (p_new_rating IS NOT DISTINCT FROM 4)::int - (p_old_rating IS NOT DISTINCT FROM 4)::int,
+        rating_count_5 = rating_count_5 + (p_new_rating IS NOT DISTINCT FROM 5)::int - (p_old_rating IS NOT DISTINCT FROM 5)::int
+    WHERE id = p_business_id;
+$$;
+
+CREATE OR REPLACE FUNCTION reviews_apply_aggregate()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.business_id = OLD.business_id THEN
+        IF NEW.rating IS DISTINCT FROM OLD.rating THEN
+            PERFORM apply_review_change(NEW.business_id, OLD.rating, NEW.rating);
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_review_change(OLD.business_id, OLD.rating, NULL);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        PERFORM apply_review_change(NEW.business_id, NULL, NEW.rating);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS bump_review_aggregate(bigint, bigint, integer);
+
+LOCK TABLE reviews IN SHARE MODE;
+
+UPDATE businesses b
+SET rating_count_1 = agg.c1,
+    rating_count_2 = agg.c2,
+    rating_count_3 = agg.c3,
+    rating_count_4 = agg.c4,
+    rating_count_5 = agg.c5
+FROM (
+    SELECT b2.id,
+           count(*) FILTER (WHERE r.rating = 1) AS c1,
+           count(*) FILTER (WHERE r.rating = 2) AS c2,
+           count(*) FILTER (WHERE r.rating = 3) AS c3,
+           count(*) FILTER (WHERE r.rating = 4) AS c4,
+           count(*) FILTER (WHERE r.rating = 5) AS c5
+    FROM businesses b2
+    LEFT JOIN reviews r ON r.business_id = b2.id
+    GROUP BY b2.id
+) agg
+WHERE agg.id = b.id;
+
+COMMIT;
+
+-- Same contract as before; drift in the histogram now counts too.
+CREATE OR REPLACE FUNCTION reconcile_review_aggregates(p_fix boolean DEFAULT false)
+RETURNS TABLE (business_id bigint, stored_sum bigint, stored_count integer, actual_sum bigint, actual_count integer)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    drifted record;
+    stored_histogram integer[];
+    actual_histogram integer[];
+BEGIN
+    FOR drifted IN
+        SELECT b.id::bigint AS id
+        FROM businesses b
+        LEFT JOIN (
+            SELECT r.business_id,
+                   sum(r.rating) AS rating_sum,
+                   count(*) AS review_count,
+                   ARRAY[
+                       count(*) FILTER (WHERE r.rating = 1), count(*) FILTER (WHERE r.rating = 2),
+                       count(*) FILTER (WHERE r.rating = 3), count(*) FILTER (WHERE r.rating = 4),
+                       count(*) FILTER (WHERE r.rating = 5)
+                   ]::integer[] AS histogram
+            FROM reviews r
+            GROUP BY r.business_id
+        ) agg ON agg.business_id = b.id
+        WHERE b.rating_sum <> coalesce(agg.rating_sum, 0)
+           OR coalesce(b.review_count, 0) <> coalesce(agg.review_count, 0)
+           OR ARRAY[b.rating_count_1, b.rating_count_2, b.rating_count_3, b.rating_count_4, b.rating_count_5]
+              <> coalesce(agg.histogram, ARRAY[0, 0, 0, 0, 0])
+    LOOP
+        IF p_fix THEN
+            PERFORM 1 FROM businesses b WHERE b.id = drifted.id FOR UPDATE;
+        END IF;
+        SELECT b.id::bigint, b.rating_sum, coalesce(b.review_count, 0)::integer,
+               ARRAY[b.rating_count_1, b.rating_count_2, b.rating_count_3, b.rating_count_4, b.rating_count_5],
+               coalesce(sum(r.rating), 0)::bigint, count(r.rating)::integer,
+               ARRAY[
+                   count(*) FILTER (WHERE r.rating = 1), count(*) FILTER (WHERE r.rating = 2),
+                   count(*) FILTER (WHERE r.rating = 3), count(*) FILTER (WHERE r.rating = 4),
+                   count(*) FILTER (WHERE r.rating = 5)
+               ]::integer[]
+        INTO business_id, stored_sum, stored_count, stored_histogram, actual_sum, actual_count, actual_histogram
+        FROM businesses b
+        LEFT JOIN reviews r ON r.business_id = b.id
+        WHERE b.id = drifted.id
+        GROUP BY b.id;
+        IF stored_sum = actual_sum AND stored_count = actual_count AND stored_histogram = actual_histogram THEN
+            CONTINUE;
+        END IF;
+        IF p_fix THEN
+            UPDATE businesses b
+            SET rating_sum = actual_sum,
+                review_count = actual_count,
+                avg_rating = CASE WHEN actual_count > 0 THEN round(actual_sum::numeric / actual_count, 2) ELSE 0 END,
+                rating_count_1 = actual_histogram[1],
+                rating_count_2 = actual_histogram[2],
+                rating_count_3 = actual_histogram[3],
+                rating_count_4 = actual_histogram[4],
+                rating_count_5 = actual_histogram[5]
+            WHERE b.id = drifted.id;
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
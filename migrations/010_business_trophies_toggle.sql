@@ -0,0 +1,82 @@
+-- businesses.trophies is maintained by a trigger on business_trophies, and
+-- toggle_business_trophy() flips one user's trophy in a single call. The
+-- trigger's UPDATE row-locks the business, so concurrent toggles apply
+-- their +1/-1 one after another instead of writing back a stale count.
+
+BEGIN;
+
+-- A user holds at most one trophy per business. Extra rows from earlier
+-- racing inserts carry no information, so drop them rather than refuse.
+DELETE FROM business_trophies t
+USING business_trophies keep
+WHERE t.business_id = keep.business_id
+  AND t.user_id = keep.user_id
+  AND t.id > keep.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS business_trophies_business_user_key
+    ON business_trophies (business_id, user_id);
+
+CREATE OR REPLACE FUNCTION business_trophies_apply_count()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE businesses SET trophies = coalesce(trophies, 0) + 1 WHERE id = NEW.business_id;
+    ELSE
+        UPDATE businesses SET trophies = greatest(coalesce(trophies, 0) - 1, 0) WHERE id = OLD.business_id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS business_trophies_count ON business_trophies;
+CREATE TRIGGER business_trophies_count
+    AFTER INSERT OR DELETE ON business_trophies
+    FOR EACH ROW EXECUTE FUNCTION business_trophies_apply_count();
+
+LOCK TABLE business_trophies IN SHARE MODE;
+
+UPDATE businesses b
+SET trophies = agg.trophies
+FROM (
+    SELECT b2.id, count(t.id) AS trophies
+    FROM businesses b2
+    LEFT JOIN business_trophies t ON t.business_id = b2.id
+    GROUP BY b2.id
+) agg
+WHERE agg.id = b.id
+  AND b.trophies IS DISTINCT FROM agg.trophies;
+
+COMMIT;
+
+-- Removes the user's trophy if they have one, otherwise adds it. Returns
+-- no row when the business doesn't exist.
+CREATE OR REPLACE FUNCTION toggle_business_trophy(p_business_id bigint, p_user_id bigint)
+RETURNS TABLE (new_count integer, has_trophy boolean)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM businesses WHERE id = p_business_id) THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM business_trophies
+    WHERE business_id = p_business_id AND user_id = p_user_id;
+    IF FOUND THEN
+        has_trophy := false;
+    ELSE
+        -- A conflict means a concurrent toggle from the same user just
+        -- added it; either way the user now holds the trophy.
+        INSERT INTO business_trophies (business_id, user_id)
+        VALUES (p_business_id, p_user_id)
+        ON CONFLICT (business_id, user_id) DO NOTHING;
+        has_trophy := true;
+    END IF;
+
+    SELECT coalesce(b.trophies, 0)::integer INTO new_count
+    FROM businesses b
+    WHERE b.id = p_business_id;
+    RETURN NEXT;
+END;
+$$;
@@ -0,0 +1,20 @@
+-- signup() inserts straight away and reads a unique violation (23505) as
+-- "username or email taken", so both columns must be unique. The index
+-- names match Postgres's defaults for UNIQUE columns, so where the
+-- constraints already exist these are no-ops.
+
+DO $$
+DECLARE
+    duplicates integer;
+BEGIN
+    SELECT (SELECT count(*) FROM (SELECT 1 FROM users GROUP BY username HAVING count(*) > 1) u)
+         + (SELECT count(*) FROM (SELECT 1 FROM users GROUP BY email HAVING count(*) > 1) e)
+    INTO duplicates;
+    IF duplicates > 0 THEN
+        RAISE EXCEPTION '% duplicated usernames/emails in users; merge those accounts before adding the unique indexes', duplicates;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_key ON users (username);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email);
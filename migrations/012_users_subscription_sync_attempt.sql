@@ -0,0 +1,16 @@
+-- reconcile-subscriptions records every attempt here, successful or not,
+-- and picks the oldest attempts first. subscription_synced_at is only
+-- written by a successful sync, so the dashboard can still tell "never
+-- fetched" apart from "fetched".
+
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS subscription_sync_attempted_at timestamptz;
+
+UPDATE users
+SET subscription_sync_attempted_at = subscription_synced_at
+WHERE subscription_sync_attempted_at IS NULL
+  AND subscription_synced_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS users_subscription_sync_attempted_at_idx
+    ON users (subscription_sync_attempted_at NULLS FIRST)
+    WHERE stripe_subscription_id IS NOT NULL;
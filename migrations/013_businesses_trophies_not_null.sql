@@ -0,0 +1,10 @@
+-- create_business never sets trophies, so new businesses stored NULL.
+-- ORDER BY trophies DESC puts NULLs first, while the in-process boards
+-- rank them as 0, and the leaderboard fallback's (trophies, id) keyset
+-- can't follow both. Store 0 instead so the two orders are the same.
+
+UPDATE businesses SET trophies = 0 WHERE trophies IS NULL;
+
+ALTER TABLE businesses
+    ALTER COLUMN trophies SET DEFAULT 0,
+    ALTER COLUMN trophies SET NOT NULL;
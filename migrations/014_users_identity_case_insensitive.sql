@@ -0,0 +1,25 @@
+-- Usernames and emails are taken case-insensitively: 'Sam' and 'sam' are
+-- the same account name. username_key and email_key hold the lower-cased
+-- values the identity index and its lookups use, and their unique
+-- indexes decide signups. The case-sensitive indexes from 011 stay; they
+-- are implied by these.
+
+DO $$
+DECLARE
+    duplicates integer;
+BEGIN
+    SELECT (SELECT count(*) FROM (SELECT 1 FROM users GROUP BY lower(username) HAVING count(*) > 1) u)
+         + (SELECT count(*) FROM (SELECT 1 FROM users GROUP BY lower(email) HAVING count(*) > 1) e)
+    INTO duplicates;
+    IF duplicates > 0 THEN
+        RAISE EXCEPTION '% usernames/emails differ only by case in users; merge those accounts before adding the case-insensitive indexes', duplicates;
+    END IF;
+END;
+$$;
+
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS username_key text GENERATED ALWAYS AS (lower(username)) STORED,
+    ADD COLUMN IF NOT EXISTS email_key text GENERATED ALWAYS AS (lower(email)) STORED;
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_lower_key ON users (username_key);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_lower_key ON users (email_key);
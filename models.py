@@ -2,9 +2,16 @@ from flask_login import UserMixin
 from extensions import login_manager
 from flask import current_app
 from postgrest.exceptions import APIError
+from cache import TTLCache
+
+# Flask-Login loads the user on every authenticated request. Anything that
+# writes to a users row must call invalidate_user afterwards.
+user_cache = TTLCache('users', maxsize=1024, ttl=60)
 
 class User(UserMixin):
-    def __init__(self, id, username, email, password_hash, confirmed, confirmed_on, profile_image_url, full_name, phone_number, age, is_premium, stripe_subscription_id):
+    def __init__(self, id, username, email, password_hash, confirmed, confirmed_on, profile_image_url, full_name, phone_number, age, is_premium, stripe_subscription_id,
+                 subscription_status=None, subscription_cancel_at_period_end=False, subscription_current_period_end=None, subscription_synced_at=None,
+                 subscription_sync_attempted_at=None, username_key=None, email_key=None):
         self.id = id
         self.username = username
         self.email = email
@@ -17,10 +24,17 @@ class User(UserMixin):
         self.age = age
         self.is_premium = is_premium
         self.stripe_subscription_id = stripe_subscription_id
+        self.subscription_status = subscription_status
+        self.subscription_cancel_at_period_end = subscription_cancel_at_period_end
+        self.subscription_current_period_end = subscription_current_period_end
+        self.subscription_synced_at = subscription_synced_at
+        self.subscription_sync_attempted_at = subscription_sync_attempted_at
+        self.username_key = username_key
+        self.email_key = email_key
 
     def check_password(self, password):
-        from werkzeug.security import check_password_hash
-        return check_password_hash(self.password_hash, password)
+        from passwords import password_hasher
+        return password_hasher.verify(self.password_hash, password)
 
 
 def get_user_by_id(user_id):
@@ -44,6 +58,21 @@ def get_user_by_username_or_email(username_or_email):
         return User(**data[0])
     return None
 
+def invalidate_user(user_id):
+    user_cache.invalidate(int(user_id))
+
+def invalidate_users(rows):
+    """Invalidate every user in the data returned by a users update."""
+    for row in rows or []:
+        if 'id' in row:
+            invalidate_user(row['id'])
+
 @login_manager.user_loader
 def load_user(user_id):
-    return get_user_by_id(int(user_id))
\ No newline at end of file
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = get_user_by_id(user_id)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
@@ -0,0 +1,95 @@
+import time
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app
+from sib_api_v3_sdk.models.send_smtp_email import SendSmtpEmail
+from email_transport import email_transport
+
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = 30
+MAX_BACKOFF = 3600
+
+
+def enqueue_email(to_email, subject, html_content, to_name=None, sender_name='Localate'):
+    """
+    Queue a transactional email for the send-emails worker. Raises if the
+    row can't be written, so callers know the email won't go out.
+    """
+    row = {
+        'to_email': to_email,
+        'to_name': to_name,
+        'subject': subject,
+        'html_content': html_content,
+        'sender_email': current_app.config['MAIL_DEFAULT_SENDER'],
+        'sender_name': sender_name
+    }
+    response = current_app.supabase.table('email_outbox').insert(row).execute()
+    return response.data[0]['id'] if response.data else None
+
+
+def backoff(attempts):
+    return min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1))
+
+
+def send_batch(supabase, transport, logger, batch_size=50):
+    """Send one claimed batch. Returns (sent, failed) counts."""
+    response = supabase.rpc('claim_email_outbox', {'p_batch': batch_size}).execute()
+    sent = failed = 0
+
+    for email in response.data or []:
+        to = {'email': email['to_email']}
+        if email.get('to_name'):
+            to['name'] = email['to_name']
+        message = SendSmtpEmail(
+            to=[to],
+            subject=email['subject'],
+            html_content=email['html_content'],
+            sender={'name': email.get('sender_name') or 'Localate', 'email': email['sender_email']}
+        )
+
+        now = datetime.now(timezone.utc)
+        try:
+            transport.send(message)
+        except Exception as e:
+            failed += 1
+            attempts = email['attempts']
+            give_up = attempts >= MAX_ATTEMPTS
+            logger.warning(f"Email {email['id']} attempt {attempts} failed: {e}")
+            supabase.table('email_outbox').update({
+                'status': 'failed' if give_up else 'pending',
+                'next_attempt_at': (now + timedelta(seconds=backoff(attempts))).isoformat(),
+                'locked_until': None,
+                'last_error': str(e)[:1000]
+            }).eq('id', email['id']).execute()
+            continue
+
+        sent += 1
+        supabase.table('email_outbox').update({
+            'status': 'sent',
+            'sent_at': now.isoformat(),
+            'locked_until': None,
+            'last_error': None
+        }).eq('id', email['id']).execute()
+
+    return sent, failed
+
+
+def init_app(app):
+    @app.cli.command('send-emails')
+    @click.option('--interval', default=5, help='Seconds to wait when the outbox is empty.')
+    @click.option('--batch-size', default=50)
+    @click.option('--once', is_flag=True, help='Drain the outbox once and exit.')
+    def send_emails_command(interval, batch_size, once):
+        """Deliver queued transactional emails with retries and backoff."""
+        while True:
+            try:
+                sent, failed = send_batch(app.supabase, email_transport, app.logger, batch_size)
+            except Exception as e:
+                app.logger.error(f"Email outbox error: {e}")
+                sent = failed = 0
+            if sent or failed:
+                click.echo(f"Sent {sent}, failed {failed}: {email_transport.stats()}")
+                continue
+            if once:
+                break
+            time.sleep(interval)
@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class PasswordPoolBusy(Exception):
+    """Raised instead of queueing when every hashing slot is taken."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """
+    Runs the password KDF in a small process pool so a burst of logins
+    can't tie up every request thread on CPU. At most `max_pending`
+    operations are queued or running; beyond that, or when an operation
+    outlives `timeout`, callers get PasswordPoolBusy rather than waiting.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=None, max_pending=None, timeout=10):
+        self.method = method
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self.rejected = 0
+        self._prefix = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or self.method
+        self.workers = app.config.get('PASSWORD_POOL_SIZE', self.workers)
+        self.max_pending = app.config.get('PASSWORD_POOL_MAX_PENDING') or self.workers * 4
+        self._slots = threading.BoundedSemaphore(max(self.max_pending, 1))
+        # One KDF run at startup, before any request thread needs it.
+        self._prefix = _hash('', self.method).split('$', 1)[0]
+        app.extensions['password_hasher'] = self
+
+    def _executor(self):
+        # A pool inherited across gunicorn's fork has no live workers, so
+        # each process starts its own on first use.
+        if self._pool is not None and self._pid == os.getpid():
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # Workers come from a forkserver rather than a fork of this
+                # process, which is already running background threads.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('forkserver')
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the job actually finishes, even if this
+        # caller stops waiting for it, so the pending cap stays honest.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash or not password:
+            return False
+        return self._run(_verify, password_hash, password)
+
+    def method_prefix(self):
+        # werkzeug expands short methods ('scrypt', 'pbkdf2:sha256') to their
+        # full parameters, so compare against what it actually writes.
+        # Without init_app the hash is made through the bounded pool.
+        if self._prefix is None:
+            self._prefix = self._run(_hash, '', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different method or work factor."""
+        return bool(password_hash) and password_hash.split('$', 1)[0] != self.method_prefix()
+
+
+password_hasher = PasswordHasher()
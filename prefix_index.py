@@ -0,0 +1,160 @@
+import threading
+from bisect import insort
+
+# Keys deeper than this share a node; longer queries are answered by
+# filtering that (small) subtree instead.
+MAX_DEPTH = 12
+
+
+class _Node:
+    __slots__ = ('children', 'top', 'ids', 'size', 'truncated', 'stale')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+        self.ids = set()
+        self.size = 0
+        # True once some entry in this subtree has been left out of top.
+        self.truncated = False
+        self.stale = False
+
+
+def normalize(name):
+    return ' '.join(name.lower().split())
+
+
+def index_keys(name):
+    """Every word-start suffix of the name, so 'yu' finds 'Threading Yuba'."""
+    lowered = normalize(name)
+    keys = []
+    for i, char in enumerate(lowered):
+        if char != ' ' and (i == 0 or lowered[i - 1] == ' '):
+            keys.append(lowered[i:i + MAX_DEPTH])
+    return keys
+
+
+class PrefixIndex:
+    """
+    Trie over business names where every node keeps its best entries by
+    review_count, so a lookup costs O(len(prefix) + k) however many names
+    share the prefix.
+    """
+
+    def __init__(self, k=10):
+        self.k = k
+        # Keep some slack so a removal rarely empties a node's top list.
+        self.capacity = k * 2
+        self.root = _Node()
+        self.businesses = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.businesses)
+
+    def build(self, rows):
+        root = _Node()
+        businesses = {}
+        for row in rows:
+            businesses[row['id']] = (row['name'], row.get('review_count') or 0)
+        # Adding the best entries first means every node's top list fills
+        # up once and everything after is rejected with one comparison.
+        entries = sorted(
+            (-review_count, normalize(name), business_id)
+            for business_id, (name, review_count) in businesses.items()
+        )
+        for entry in entries:
+            for key in index_keys(businesses[entry[2]][0]):
+                self._add_key(root, key, entry)
+        with self._lock:
+            self.root = root
+            self.businesses = businesses
+
+    def upsert(self, business_id, name, review_count):
+        review_count = review_count or 0
+        with self._lock:
+            self._remove(business_id)
+            self.businesses[business_id] = (name, review_count)
+            entry = (-review_count, normalize(name), business_id)
+            for key in index_keys(name):
+                self._add_key(self.root, key, entry)
+
+    def remove(self, business_id):
+        with self._lock:
+            self._remove(business_id)
+
+    def search(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            node = self.root
+            for char in prefix[:MAX_DEPTH]:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+
+            if len(prefix) > MAX_DEPTH:
+                entries = sorted(self._entries(self._subtree_ids(node)))
+                entries = [e for e in entries if (' ' + e[1]).find(' ' + prefix) != -1]
+            else:
+                if node.stale:
+                    entries = sorted(self._entries(self._subtree_ids(node)))
+                    node.top = entries[:self.capacity]
+                    node.truncated = len(entries) > self.capacity
+                    node.stale = False
+                entries = node.top
+            return [self.businesses[e[2]][0] for e in entries[:limit]]
+
+    def _entries(self, ids):
+        return [(-self.businesses[i][1], normalize(self.businesses[i][0]), i) for i in ids]
+
+    def _subtree_ids(self, node):
+        ids = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            ids.update(current.ids)
+            stack.extend(current.children.values())
+        return ids
+
+    def _add_key(self, root, key, entry):
+        node = root
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            node.size += 1
+            # Once entries have been left out, top only stays the true best
+            # if newcomers have to beat its current worst entry.
+            if node.truncated and node.top and entry > node.top[-1]:
+                continue
+            if len(node.top) >= self.capacity and entry > node.top[-1]:
+                node.truncated = True
+                continue
+            if entry in node.top:
+                continue
+            insort(node.top, entry)
+            if len(node.top) > self.capacity:
+                del node.top[self.capacity:]
+                node.truncated = True
+        node.ids.add(entry[2])
+
+    def _remove(self, business_id):
+        existing = self.businesses.pop(business_id, None)
+        if existing is None:
+            return
+        name, review_count = existing
+        entry = (-review_count, normalize(name), business_id)
+        for key in index_keys(name):
+            path = [self.root]
+            for char in key:
+                path.append(path[-1].children[char])
+            path[-1].ids.discard(business_id)
+            for parent, char, node in zip(path, key, path[1:]):
+                node.size -= 1
+                if entry in node.top:
+                    node.top.remove(entry)
+                    # Something outside the kept slice may now belong in it.
+                    if len(node.top) < self.k and node.truncated:
+                        node.stale = True
+            for parent, char, node in reversed(list(zip(path, key, path[1:]))):
+                if node.size == 0:
+                    del parent.children[char]
@@ -0,0 +1,31 @@
+import time
+import click
+
+
+def reconcile_review_aggregates(supabase, fix=False):
+    """
+    Compare businesses.rating_sum/review_count with the reviews table.
+    Returns the businesses that disagreed (and were corrected, with fix).
+    """
+    response = supabase.rpc('reconcile_review_aggregates', {'p_fix': fix}).execute()
+    return response.data or []
+
+
+def init_app(app):
+    @app.cli.command('reconcile-reviews')
+    @click.option('--fix', is_flag=True, help='Correct drifted aggregates instead of only reporting them.')
+    @click.option('--interval', default=0, help='Repeat every N seconds instead of running once.')
+    def reconcile_reviews_command(fix, interval):
+        """Verify the trigger-maintained review aggregates on businesses."""
+        while True:
+            drifted = reconcile_review_aggregates(app.supabase, fix=fix)
+            for row in drifted:
+                app.logger.warning(
+                    f"Review aggregate drift for business {row['business_id']}: "
+                    f"stored {row['stored_sum']}/{row['stored_count']}, "
+                    f"actual {row['actual_sum']}/{row['actual_count']}"
+                )
+            click.echo(f"{len(drifted)} businesses {'fixed' if fix else 'drifted'}")
+            if not interval:
+                break
+            time.sleep(interval)
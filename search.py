@@ -5,13 +5,21 @@ from math import ceil
 from datetime import datetime, date, timedelta
 import pytz
 from flask import jsonify
-from sib_api_v3_sdk import Configuration, ApiClient
-from sib_api_v3_sdk.api.transactional_emails_api import TransactionalEmailsApi
-from sib_api_v3_sdk.models.send_smtp_email import SendSmtpEmail
-from sib_api_v3_sdk.rest import ApiException
+import base64
+import json
+from analytics import analytics_buffer
+from outbox import enqueue_email
+from emails import email_templates, AppointmentBookedEmail, AppointmentCanceledEmail
+from cache import ResultCache, TTLCache
+from search_service import apply_name_filter, fuzzy_business_ids, autocomplete_names
+from availability import availability
+from leaderboard import leaderboard_service, trophies_keyset_filter
+from postgrest.exceptions import APIError
 
 search_bp = Blueprint('search', __name__, url_prefix='/search')
 
+UNIQUE_VIOLATION = '23505'
+
 STATE_ABBREVIATIONS = {
         'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
         'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'florida': 'FL', 'georgia': 'GA',
@@ -28,33 +36,21 @@ STATE_ABBREVIATIONS = {
 def record_analytics(business_id, field):
     supabase = current_app.supabase
 
-    # Check if today's row exists
-    existing = supabase.table("business_analytics")\
-        .select("id, " + field)\
-        .eq("business_id", business_id)\
-        .eq("date", str(date.today()))\
-        .execute()
-
-    if not existing.data:
-        # Insert a new row for today
-        supabase.table("business_analytics").insert({
-            "business_id": business_id,
-            "date": str(date.today()),
-            "profile_views": 1 if field == "profile_views" else 0,
-            "search_appearances": 1 if field == "search_appearances" else 0
-        }).execute()
-    else:
-        row = existing.data[0]
-        supabase.table("business_analytics").update({
-            field: row[field] + 1
-        }).eq("id", row["id"]).execute()
+    # Single atomic upsert-and-increment, see migrations/001_business_analytics_increment.sql
+    supabase.rpc("increment_business_analytics", {
+        "p_business_id": business_id,
+        "p_date": str(date.today()),
+        "p_profile_views": 1 if field == "profile_views" else 0,
+        "p_search_appearances": 1 if field == "search_appearances" else 0
+    }).execute()
 
 def record_search_analytics(businesses):
-    for b in businesses:
-        try:
-            record_analytics(b["id"], "search_appearances")
-        except Exception as e:
-            current_app.logger.warning(f"Analytics error for business {b['id']}: {e}")
+    # Buffered in-process and flushed in bulk so search latency doesn't
+    # grow with the number of results on the page.
+    try:
+        analytics_buffer.increment_many([b["id"] for b in businesses], "search_appearances")
+    except Exception as e:
+        current_app.logger.warning(f"Analytics error for search results: {e}")
 
 
 def create_gcal_event(business_name, business_id, date, time, user_name, user_email, user_phone):
@@ -96,16 +92,192 @@ def create_gcal_event(business_name, business_id, date, time, user_name, user_em
         current_app.logger.error(f'Error creating Google Calendar link: {e}')
         return None
     
+SEARCH_PAGE_SIZE = 20
+
+search_cache = ResultCache('search', maxsize=2048, ttl=30)
+
+def parse_location(location):
+    """Split a location filter into (city, state), abbreviating state names."""
+    location = location.strip()
+    if not location:
+        return None, None
+    if ',' in location:
+        city, state = [part.strip() for part in location.split(',', 1)]
+        return city, STATE_ABBREVIATIONS.get(state.lower(), state)
+    state_abbr = STATE_ABBREVIATIONS.get(location.lower())
+    if state_abbr:
+        return None, state_abbr
+    return location, None
+
+def apply_location_filter(filters, city, state):
+    if city:
+        filters = filters.ilike('city', f'*{city}*')
+    if state:
+        filters = filters.eq('state', state)
+    return filters
+
+def normalize_search(query, category, location, popularity):
+    """
+    Reduce the search parameters to the values that actually change the
+    result set, so equivalent searches share a cache entry.
+    """
+    city, state = parse_location(location)
+    return {
+        'query': query.strip().lower(),
+        'category': category,
+        'city': city.lower() if city else None,
+        'state': state,
+        'popularity': 'least' if popularity == 'least' else 'most'
+    }
+
+def search_scope(category, state):
+    return f"{category or '*'}|{state or '*'}"
+
+TROPHY_STATUS_MAX_IDS = 100
+
+def given_trophies(supabase, user_id, business_ids):
+    """Ids among business_ids the user has given a trophy, in one query."""
+    business_ids = list({int(b) for b in business_ids})
+    if not business_ids:
+        return set()
+    response = supabase.table("business_trophies") \
+        .select("business_id") \
+        .eq("user_id", user_id) \
+        .in_("business_id", business_ids) \
+        .execute()
+    return {row["business_id"] for row in response.data or []}
+
+def current_user_trophies(businesses):
+    if not current_user.is_authenticated or not businesses:
+        return set()
+    try:
+        return given_trophies(current_app.supabase, current_user.id, [b['id'] for b in businesses])
+    except Exception as e:
+        current_app.logger.warning(f"Could not load trophy state: {e}")
+        return set()
+
+def invalidate_business_search(*businesses):
+    """
+    Drop cached search pages that could contain these businesses. Pass the
+    business as it was before and after a write when category/state change.
+    """
+    scopes = []
+    for business in businesses:
+        if not business:
+            continue
+        category = business.get('category')
+        state = business.get('state')
+        scopes += [
+            search_scope(None, None),
+            search_scope(category, None),
+            search_scope(None, state),
+            search_scope(category, state)
+        ]
+    search_cache.bump(*scopes)
+
+def fetch_search_page(supabase, params, after):
+    page = query_search_page(supabase, params, after)
+
+    # Nothing contains the query as typed, so fall back to close matches.
+    # Later pages land here too: the substring filter stays empty for them.
+    if params['query'] and not page['businesses']:
+        ids = fuzzy_business_ids(supabase, params['query'])
+        if ids:
+            page = query_search_page(supabase, params, after, ids=ids)
+            page['fuzzy'] = True
+    return page
+
+def query_search_page(supabase, params, after, ids=None):
+    filters = supabase.table('businesses').select('*, user:user_id(is_premium)')
+
+    if ids is not None:
+        filters = filters.in_('id', ids)
+    elif params['query']:
+        filters = apply_name_filter(filters, params['query'])
+    if params['category']:
+        filters = filters.eq('category', params['category'])
+    filters = apply_location_filter(filters, params['city'], params['state'])
+
+    if params['popularity'] == 'least':
+        filters = filters.order('boosted_score', desc=False).order('id', desc=False)
+    else:
+        filters = filters.order('boosted_score', desc=True).order('id', desc=False)
+
+    # Keyset on (boosted_score, id), matching the sort order, so the
+    # database can seek straight into the composite index for any page.
+    if after is not None:
+        filters = filters.or_(search_keyset_filter(params['popularity'], *after))
+
+    response = filters.limit(SEARCH_PAGE_SIZE + 1).execute()
+    businesses = response.data or []
+
+    has_more = len(businesses) > SEARCH_PAGE_SIZE
+    if has_more:
+        businesses = businesses[:SEARCH_PAGE_SIZE]
+
+    next_cursor = None
+    if has_more and businesses:
+        last_business = businesses[-1]
+        next_cursor = encode_cursor(last_business['boosted_score'], last_business['id'])
+
+    return {
+        'businesses': businesses,
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'fuzzy': False
+    }
+
+def search_keyset_filter(popularity, score, last_id):
+    """
+    Rows after (score, last_id) in search order. Postgres sorts NULL scores
+    first when descending and last when ascending; a None score is the
+    cursor of a row inside that NULL run.
+    """
+    if popularity == 'least':
+        if score is None:
+            return f"and(boosted_score.is.null,id.gt.{last_id})"
+        return f"boosted_score.gt.{score},and(boosted_score.eq.{score},id.gt.{last_id}),boosted_score.is.null"
+    if score is None:
+        return f"boosted_score.not.is.null,and(boosted_score.is.null,id.gt.{last_id})"
+    return f"boosted_score.lt.{score},and(boosted_score.eq.{score},id.gt.{last_id})"
+
+def encode_cursor(boosted_score, business_id):
+    raw = json.dumps([boosted_score, business_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Returns (boosted_score, id), or None for a missing or malformed cursor.
+    The score is None when the row's score was NULL.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, business_id = json.loads(raw)
+        return (None if score is None else float(score)), int(business_id)
+    except (ValueError, TypeError):
+        return None
+
+def search_page(query, category, location, popularity, cursor):
+    params = normalize_search(query, category, location, popularity)
+    after = decode_cursor(cursor)
+    scope = search_scope(params['category'], params['state'])
+    key = [params, after]
+
+    page = search_cache.get(scope, key)
+    if page is None:
+        page = fetch_search_page(current_app.supabase, params, after)
+        search_cache.set(scope, key, page)
+    return page
+
 @search_bp.route('/', methods=['GET'])
 def search():
-    supabase = current_app.supabase
     query = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
     location = request.args.get('location', '').strip()
     popularity = request.args.get('popularity', '').strip()
-    per_page = 20
-    last_id = request.args.get('last_id', type=int)
-    filters = supabase.table('businesses').select('*, user:user_id(is_premium)')
+    cursor = request.args.get('cursor', '')
 
     if not (query or category or location):
         return render_template(
@@ -120,125 +292,49 @@ def search():
             has_more=False
         )
 
-    if query:
-        filters = filters.ilike('name', f'*{query}*')
-    if category:
-        filters = filters.eq('category', category)
-    if location:
-        if ',' in location:
-            city, state = [part.strip() for part in location.split(',', 1)]
-            state = STATE_ABBREVIATIONS.get(state.lower(), state)
-            filters = filters.ilike('city', f'*{city}*').eq('state', state)
-        else:
-            loc = location.strip()
-            state_abbr = STATE_ABBREVIATIONS.get(loc.lower())
-            if state_abbr:
-                filters = filters.eq('state', state_abbr)
-            else:
-                filters = filters.ilike('city', f'*{loc}*')
-
-    if popularity == 'least':
-        filters = filters.order('boosted_score', desc=False).order('id', desc=False)
-    else:  
-        filters = filters.order('boosted_score', desc=True).order('id', desc=False)
-    if last_id is not None:
-        filters = filters.gt('id', last_id)
-
-    response = filters.limit(per_page + 1).execute()
-    businesses = response.data or []
-
-    has_more = len(businesses) > per_page
-    if has_more:
-        businesses = businesses[:per_page]
-
-    next_cursor = None
-    if has_more and businesses:
-        last_business = businesses[-1]
-        next_cursor = {
-            'last_id': last_business['id'],
-            'last_boosted_score': last_business.get('boosted_score')
-        }
+    page = search_page(query, category, location, popularity, cursor)
+    businesses = page['businesses']
 
+    # Recorded for cached pages too; every rendered result is an appearance.
     if businesses:
         record_search_analytics(businesses)
 
     return render_template(
         'search.html',
         businesses=businesses,
+        given_trophies=current_user_trophies(businesses),
         popularity=popularity,
-        next_cursor=next_cursor,
+        next_cursor=page['next_cursor'],
         query=query,
         category=category,
         location=location,
         is_empty_search=False,
-        has_more=has_more
+        has_more=page['has_more'],
+        fuzzy_match=page['fuzzy']
     )
 
 
 @search_bp.route('/api/load-more', methods=['GET'])
 def load_more():
-    supabase = current_app.supabase
     query = request.args.get('q', '').strip()
     category = request.args.get('category', '').strip()
     location = request.args.get('location', '').strip()
     popularity = request.args.get('popularity', '').strip()
-    per_page = 20
+    cursor = request.args.get('cursor', '')
 
-    last_id = request.args.get('last_id', type=int)
+    page = search_page(query, category, location, popularity, cursor)
+    # The page may come from the shared cache, so per-user state travels
+    # alongside it rather than inside it.
+    given = current_user_trophies(page['businesses'])
 
-    filters = supabase.table('businesses').select('*, user:user_id(is_premium)')
+    return jsonify(dict(page, given_trophies=sorted(given)))
 
-    # Apply filters (same as search route)
-    if query:
-        filters = filters.ilike('name', f'*{query}*')
-    if category:
-        filters = filters.eq('category', category)
-    if location:
-        if ',' in location:
-            city, state = [part.strip() for part in location.split(',', 1)]
-            state = STATE_ABBREVIATIONS.get(state.lower(), state)
-            filters = filters.ilike('city', f'*{city}*').eq('state', state)
-        else:
-            loc = location.strip()
-            state_abbr = STATE_ABBREVIATIONS.get(loc.lower())
-            if state_abbr:
-                filters = filters.eq('state', state_abbr)
-            else:
-                filters = filters.ilike('city', f'*{loc}*')
-
-    # SIMPLIFIED: Use only last_id for cursor, but still sort by boosted_score
-    if popularity == 'least':
-        filters = filters.order('boosted_score', desc=False).order('id', desc=False)
-    else:  # most or default
-        filters = filters.order('boosted_score', desc=True).order('id', desc=False)
-    
-    # Simple cursor - just use ID (this is reliable)
-    if last_id is not None:
-        filters = filters.gt('id', last_id)
-
-    response = filters.limit(per_page + 1).execute()
-    businesses = response.data or []
-
-    has_more = len(businesses) > per_page
-    if has_more:
-        businesses = businesses[:per_page]
-
-    next_cursor = None
-    if has_more and businesses:
-        last_business = businesses[-1]
-        next_cursor = {
-            'last_id': last_business['id'],
-            'last_boosted_score': last_business.get('boosted_score')
-        }
-
-    return jsonify({
-        'businesses': businesses,
-        'has_more': has_more,
-        'next_cursor': next_cursor
-    })
 @search_bp.route('/customer_view/<int:business_id>')
 def customer_view(business_id):
-    record_analytics(business_id, "profile_views")
+    try:
+        record_analytics(business_id, "profile_views")
+    except Exception as e:
+        current_app.logger.warning(f"Analytics error for business {business_id}: {e}")
     supabase = current_app.supabase
     response = supabase.table('businesses').select('*').eq('id', business_id).single().execute()
     business = response.data
@@ -291,6 +387,27 @@ def customer_view(business_id):
         page=page
     )
 
+@search_bp.route('/business/<int:business_id>/availability', methods=['GET'])
+def business_availability(business_id):
+    start = request.args.get('start', '')
+    days = request.args.get('days', 14, type=int)
+
+    try:
+        start_date = date.fromisoformat(start) if start else None
+    except ValueError:
+        return jsonify({"error": "start must be YYYY-MM-DD"}), 400
+
+    try:
+        result = availability.free_slots(current_app.supabase, business_id, start=start_date, days=days)
+    except Exception as e:
+        current_app.logger.error(f"Error computing availability for business {business_id}: {e}")
+        return jsonify({"error": "Server error"}), 500
+
+    if result is None:
+        return jsonify({"error": "Business not found"}), 404
+
+    return jsonify({"business_id": business_id, **result})
+
 @search_bp.route('/book_appointment', methods=['POST'])
 @login_required
 def book_appointment():
@@ -308,28 +425,28 @@ def book_appointment():
         date_obj = datetime.strptime(selected_date, "%Y-%m-%d").date()
         time_obj = datetime.strptime(selected_time, "%H:%M").time()
 
-        existing = supabase.table('appointments') \
-            .select('id') \
-            .eq('business_id', int(business_id)) \
-            .eq('date', date_obj.isoformat()) \
-            .eq('time', time_obj.strftime("%H:%M:%S")) \
-            .execute()
-
-        if existing.data:
+        # The unique (business_id, date, time) index makes this insert the
+        # availability check, so concurrent bookings can't both succeed.
+        try:
+            supabase.table('appointments').insert({
+                'user_id': current_user.id,
+                'business_id': int(business_id),
+                'date': date_obj.isoformat(),
+                'time': time_obj.strftime("%H:%M:%S"),
+                'email': current_user.email,
+                'name': current_user.full_name,
+                'phone': current_user.phone_number,
+                'age': current_user.age,
+                'profile_image_url': current_user.profile_image_url
+            }).execute()
+        except APIError as e:
+            if e.code != UNIQUE_VIOLATION:
+                raise
+            availability.mark_booked(int(business_id), date_obj.isoformat(), time_obj.strftime("%H:%M:%S"))
             flash("This time slot is already booked. Please choose another.", "error")
             return redirect(request.referrer or url_for('search.customer_view', business_id=business_id))
 
-        supabase.table('appointments').insert({
-            'user_id': current_user.id,
-            'business_id': int(business_id),
-            'date': date_obj.isoformat(),
-            'time': time_obj.strftime("%H:%M:%S"),
-            'email': current_user.email,
-            'name': current_user.full_name,
-            'phone': current_user.phone_number,
-            'age': current_user.age,
-            'profile_image_url': current_user.profile_image_url
-        }).execute()
+        availability.mark_booked(int(business_id), date_obj.isoformat(), time_obj.strftime("%H:%M:%S"))
 
         business_info = supabase.table('businesses') \
             .select('user_id, name') \
@@ -361,73 +478,21 @@ def book_appointment():
             user_phone=current_user.phone_number
         )
 
-        # Prepare calendar section for email
-        calendar_section = ""
-        if calendar_event:
-            calendar_section = f"""
-                    <p style="font-size: 16px; margin-top: 20px;">
-                        <a href="{calendar_event['calendar_url']}" style="color: #0000EE; text-decoration: underline;">
-                            📅 Add to Google Calendar
-                        </a>
-                    </p>
-            """
-
-        html_content = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #333; margin-top: 0;">New Appointment for {business_name}</h2>
-                
-                <p style="font-size: 16px; line-height: 1.6;">
-                    You have a new appointment booking:
-                </p>
-                
-                <div style="background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Name:</strong> {current_user.full_name}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Email:</strong> {current_user.email}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Phone:</strong> {current_user.phone_number}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Date:</strong> {selected_date}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Time:</strong> {formatted_time}
-                    </p>
-                </div>
-                
-                <p style="font-size: 16px;">
-                    Please confirm this appointment or contact the user if the time is no longer available.
-                </p>
-                
-                {calendar_section}
-                
-                <p style="margin-top: 30px; font-size: 14px; color: #666;">
-                    — Localate Team
-                </p>
-            </div>
-        """
-        configuration = Configuration()
-        configuration.api_key['api-key'] = current_app.config['BREVO_API_KEY']
-
-        api_client = ApiClient(configuration)
-        api_instance = TransactionalEmailsApi(api_client)
-
-        send_smtp_email = SendSmtpEmail(
-            to=[{"email": owner_email}],
-            subject=f"New Appointment for {business_name}",
-            html_content=html_content,
-            sender={"name": "Localate", "email": current_app.config['MAIL_DEFAULT_SENDER']}
-        )
-
-        api_instance.send_transac_email(send_smtp_email)
-
-        flash("Appointment booked successfully. Confirmation pending from owner!", "success")
+        subject, html_content = email_templates.render(AppointmentBookedEmail(
+            business_name=business_name,
+            name=current_user.full_name,
+            email=current_user.email,
+            phone=current_user.phone_number,
+            date=selected_date,
+            time=formatted_time,
+            calendar_url=calendar_event['calendar_url'] if calendar_event else None
+        ))
 
-    except ApiException as api_err:
-            current_app.logger.error(f"Failed to send email via Brevo: {api_err}")
+        try:
+            enqueue_email(owner_email, subject, html_content)
+            flash("Appointment booked successfully. Confirmation pending from owner!", "success")
+        except Exception as e:
+            current_app.logger.error(f"Failed to queue booking email: {e}")
             flash("Appointment booked but failed to send confirmation email.", "warning")
 
     except Exception as e:
@@ -481,60 +546,18 @@ def cancel_appointment():
         formatted_time = datetime.strptime(appointment['time'], "%H:%M:%S").strftime("%I:%M %p").lstrip("0")
 
         supabase.table('appointments').delete().eq('id', appointment_id).execute()
+        availability.mark_free(appointment['business_id'], appointment['date'], appointment['time'])
 
-        configuration = Configuration()
-        configuration.api_key['api-key'] = current_app.config['BREVO_API_KEY']
-        api_client = ApiClient(configuration)
-        api_instance = TransactionalEmailsApi(api_client)
-
-        html_content = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #d32f2f; margin-top: 0;">Appointment Canceled for {business_name}</h2>
-                
-                <p style="font-size: 16px; line-height: 1.6;">
-                    A user has canceled their appointment:
-                </p>
-                
-                <div style="background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Name:</strong> {appointment['name']}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Email:</strong> {appointment['email']}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Phone:</strong> {appointment['phone']}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Date:</strong> {appointment['date']}
-                    </p>
-                    <p style="font-size: 16px; margin: 5px 0;">
-                        <strong>Time:</strong> {formatted_time}
-                    </p>
-                </div>
-                
-                <p style="font-size: 16px;">
-                    This slot is now reopened automatically.
-                </p>
-                
-                <p style="margin-top: 30px; font-size: 14px; color: #666;">
-                    — Localate Team
-                </p>
-            </div>
-        """
-
-        send_smtp_email = SendSmtpEmail(
-            to=[{"email": owner_email}],
-            subject=f"Appointment Canceled for {business_name}",
-            html_content=html_content,
-            sender={"name": "Localate", "email": current_app.config['MAIL_DEFAULT_SENDER']}
-        )
-
-        api_instance.send_transac_email(send_smtp_email)
-
+        subject, html_content = email_templates.render(AppointmentCanceledEmail(
+            business_name=business_name,
+            name=appointment['name'],
+            email=appointment['email'],
+            phone=appointment['phone'],
+            date=appointment['date'],
+            time=formatted_time
+        ))
 
-    except ApiException as api_err:
-        current_app.logger.error(f"Brevo API error: {api_err}")
+        enqueue_email(owner_email, subject, html_content)
 
     except Exception as e:
         current_app.logger.error(f"Error canceling appointment: {e}")
@@ -550,14 +573,7 @@ def autocomplete():
     if not query:
         return jsonify([])
 
-    response = supabase.table('businesses') \
-        .select('name, review_count') \
-        .ilike('name', f'%{query}%') \
-        .order('review_count', desc=True) \
-        .limit(10) \
-        .execute()
-
-    results = [b['name'] for b in response.data]
+    results = autocomplete_names(supabase, query, limit=10)
     return jsonify(results)
 
 @search_bp.route('/business/<int:business_id>/trophy', methods=['POST'])
@@ -567,50 +583,22 @@ def toggle_trophy(business_id):
         supabase = current_app.supabase
         user_id = current_user.id  # INT, not str
 
-        # Check if business exists
-        business_check = supabase.table("businesses") \
-            .select("id, trophies") \
-            .eq("id", business_id) \
-            .execute()
-        if not business_check.data:
+        # Membership and businesses.trophies change together server-side,
+        # so concurrent toggles can't leave the count out of step.
+        response = supabase.rpc("toggle_business_trophy", {
+            "p_business_id": business_id,
+            "p_user_id": user_id
+        }).execute()
+        if not response.data:
             return jsonify({"error": "Business not found"}), 404
 
-        current_count = business_check.data[0].get("trophies", 0)
-
-        # Check if user already gave a trophy
-        existing = supabase.table("business_trophies") \
-            .select("id") \
-            .eq("business_id", business_id) \
-            .eq("user_id", user_id) \
-            .execute()
-
-        if existing.data:
-            # Remove trophy
-            supabase.table("business_trophies") \
-                .delete() \
-                .eq("business_id", business_id) \
-                .eq("user_id", user_id) \
-                .execute()
-            new_count = max(current_count - 1, 0)
-            toggled = "removed"
-        else:
-            # Add trophy
-            supabase.table("business_trophies") \
-                .insert({"business_id": business_id, "user_id": user_id}) \
-                .execute()
-            new_count = current_count + 1
-            toggled = "added"
-
-        # Update trophies count in businesses table
-        supabase.table("businesses") \
-            .update({"trophies": new_count}) \
-            .eq("id", business_id) \
-            .execute()
-
+        result = response.data[0]
+        leaderboard_service.update_trophies(business_id, result["new_count"])
         return jsonify({
             "success": True,
-            "new_count": new_count,
-            "toggled": toggled
+            "new_count": result["new_count"],
+            "has_trophy": result["has_trophy"],
+            "toggled": "added" if result["has_trophy"] else "removed"
         })
 
     except Exception as e:
@@ -622,50 +610,97 @@ def toggle_trophy(business_id):
 @login_required
 def trophy_status(business_id):
     try:
-        supabase = current_app.supabase
-        user_id = current_user.id  # INT, not str
+        given = given_trophies(current_app.supabase, current_user.id, [business_id])
+        return jsonify({"has_trophy": business_id in given})
 
-        existing = supabase.table("business_trophies") \
-            .select("id") \
-            .eq("business_id", business_id) \
-            .eq("user_id", user_id) \
-            .execute()
+    except Exception as e:
+        print(f"Trophy status error: {e}")
+        return jsonify({"error": "Server error"}), 500
 
-        return jsonify({"has_trophy": bool(existing.data)})
+
+@search_bp.route('/trophy_status', methods=['GET'])
+@login_required
+def bulk_trophy_status():
+    try:
+        business_ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+    if len(business_ids) > TROPHY_STATUS_MAX_IDS:
+        return jsonify({"error": f"At most {TROPHY_STATUS_MAX_IDS} ids per request"}), 400
+
+    try:
+        given = given_trophies(current_app.supabase, current_user.id, business_ids)
+        return jsonify({"given": sorted(given)})
 
     except Exception as e:
         print(f"Trophy status error: {e}")
         return jsonify({"error": "Server error"}), 500
-    
+
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_MAX_LIMIT = 50
+LEADERBOARD_FIELDS = 'id, name, trophies, city, state'
+leaderboard_totals = TTLCache('leaderboard-totals', maxsize=512, ttl=60)
+
+def database_leaderboard_page(city, state, limit, after):
+    """Fallback while the in-process boards load; same order and cursor."""
+    filters = current_app.supabase.table('businesses').select(LEADERBOARD_FIELDS)
+    filters = apply_location_filter(filters, city, state)
+    if after:
+        filters = filters.or_(trophies_keyset_filter(int(after[0]), after[1]))
+    response = filters.order('trophies', desc=True).order('id', desc=False).limit(limit).execute()
+    businesses = response.data or []
+
+    total = leaderboard_totals.get((city, state))
+    if total is None:
+        count_query = current_app.supabase.table('businesses').select('id', count='exact')
+        total = apply_location_filter(count_query, city, state).limit(1).execute().count or 0
+        leaderboard_totals.set((city, state), total)
+    return businesses, total
+
 @search_bp.route('/leaderboard', methods=['GET'])
 def leaderboard():
-    supabase = current_app.supabase
     location = request.args.get('location', '').strip()
-    MAX_FETCH = 1000 
-
-    filters = supabase.table('businesses').select('id, name, trophies, city, state')
-
-    if location:
-        if ',' in location:
-            city, state = [part.strip() for part in location.split(',', 1)]
-            state = STATE_ABBREVIATIONS.get(state.lower(), state)
-            filters = filters.ilike('city', f'*{city}*').eq('state', state)
-        else:
-            loc = location.strip()
-            state_abbr = STATE_ABBREVIATIONS.get(loc.lower())
-            if state_abbr:
-                filters = filters.eq('state', state_abbr)
-            else:
-                filters = filters.ilike('city', f'*{loc}*')
-
-    response = filters.order('trophies', desc=True).limit(MAX_FETCH).execute()
-    businesses = response.data or []
+    try:
+        limit = min(max(int(request.args.get('limit', LEADERBOARD_PAGE_SIZE)), 1), LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "error": "limit must be an integer"}), 400
+    after = decode_cursor(request.args.get('cursor', ''))
+    if after is not None and after[0] is None:
+        # Leaderboard cursors always carry a count; NULL trophies rank as 0.
+        after = None
+
+    city, state = parse_location(location)
+    # One row past the page says whether there is a next one, so a page
+    # that ends exactly at the last business gets no cursor.
+    result = leaderboard_service.page(city, state, limit=limit + 1, after=after)
+    if result is not None:
+        businesses, total = result
+    else:
+        businesses, total = database_leaderboard_page(city, state, limit + 1, after)
 
-    return jsonify({
+    next_cursor = None
+    if len(businesses) > limit:
+        businesses = businesses[:limit]
+        last = businesses[-1]
+        next_cursor = encode_cursor(last['trophies'] or 0, last['id'])
+
+    response = jsonify({
         "success": True,
         "leaderboard": businesses,
-        "total": len(businesses)
+        "total": total,
+        "next_cursor": next_cursor
     })
+    # Both leaderboard panels ask for the same URL; let the browser share it.
+    response.headers['Cache-Control'] = 'public, max-age=15'
+    return response
+
+
+@search_bp.route('/leaderboard/rank/<int:business_id>', methods=['GET'])
+def leaderboard_rank(business_id):
+    ranks = leaderboard_service.rank(business_id)
+    if ranks is None:
+        return jsonify({"success": False, "error": "Business not ranked"}), 404
+    return jsonify({"success": True, "business_id": business_id, "rank": ranks})
 
 
 @search_bp.route('/business/<int:business_id>/analytics', methods=['GET'])
@@ -0,0 +1,118 @@
+"""
+Business name matching shared by search(), load_more() and autocomplete().
+
+Database lookups are backed by the pg_trgm index and functions in
+migrations/004_businesses_name_trgm.sql. Autocomplete is answered from an
+in-process PrefixIndex once it has been loaded.
+"""
+import os
+import threading
+from prefix_index import PrefixIndex
+
+FUZZY_CANDIDATES = 200
+
+
+class NameIndexService:
+    """
+    Keeps a PrefixIndex of every business name loaded in this process.
+    Writes update it incrementally; a periodic full rebuild picks up
+    changes made by other workers.
+    """
+
+    def __init__(self, k=10):
+        self.index = PrefixIndex(k=k)
+        self.ready = False
+        self.supabase = None
+        self.logger = None
+        self.refresh_interval = 600
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.supabase = app.supabase
+        self.logger = app.logger
+        self.refresh_interval = app.config.get('AUTOCOMPLETE_REFRESH_INTERVAL', self.refresh_interval)
+        app.extensions['name_index'] = self
+        self.ensure_started()
+
+    def ensure_started(self):
+        # Threads don't survive gunicorn's fork, so each worker starts its own.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='name-index', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Could not load business name index: {e}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def rebuild(self, batch_size=1000):
+        rows = []
+        last_id = 0
+        while True:
+            response = self.supabase.table('businesses') \
+                .select('id, name, review_count') \
+                .gt('id', last_id) \
+                .order('id', desc=False) \
+                .limit(batch_size) \
+                .execute()
+            batch = response.data or []
+            rows.extend(b for b in batch if b.get('name'))
+            if len(batch) < batch_size:
+                break
+            last_id = batch[-1]['id']
+        self.index.build(rows)
+        self.ready = True
+
+    def update(self, business):
+        if business and business.get('name'):
+            self.index.upsert(business['id'], business['name'], business.get('review_count'))
+
+    def search(self, query, limit=10):
+        self.ensure_started()
+        if not self.ready:
+            return None
+        return self.index.search(query, limit)
+
+
+name_index = NameIndexService(k=10)
+
+
+def apply_name_filter(filters, query):
+    # '%query%' ILIKE is served by businesses_name_trgm_idx rather than a
+    # sequential scan.
+    return filters.ilike('name', f'*{query}*')
+
+
+def fuzzy_business_ids(supabase, query, limit=FUZZY_CANDIDATES):
+    """Ids of businesses whose name is close to `query`, tolerating typos."""
+    response = supabase.rpc('search_business_ids_fuzzy', {
+        'p_query': query,
+        'p_limit': limit
+    }).execute()
+    return [row['id'] for row in response.data or []]
+
+
+def autocomplete_names(supabase, query, limit=10):
+    names = name_index.search(query, limit)
+    if names is not None:
+        return names
+
+    # Index still loading in this worker.
+    response = supabase.rpc('autocomplete_business_names', {
+        'p_query': query,
+        'p_limit': limit
+    }).execute()
+    return [row['name'] for row in response.data or []]
@@ -0,0 +1,87 @@
+import time
+from datetime import datetime, timedelta, timezone
+import click
+import stripe
+from flask import current_app
+from models import invalidate_users
+
+ACTIVE_STATUSES = {'active', 'trialing', 'past_due'}
+
+
+def subscription_state(subscription):
+    """Map a Stripe subscription object onto the users.subscription_* columns."""
+    period_end = subscription.get('current_period_end')
+    if period_end is None:
+        # Newer Stripe API versions only report the period on the items.
+        items = (subscription.get('items') or {}).get('data') or []
+        if items:
+            period_end = items[0].get('current_period_end')
+
+    status = subscription.get('status')
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        'is_premium': status in ACTIVE_STATUSES,
+        'subscription_status': status,
+        'subscription_cancel_at_period_end': bool(subscription.get('cancel_at_period_end')),
+        'subscription_current_period_end': (
+            datetime.fromtimestamp(period_end, tz=timezone.utc).isoformat() if period_end else None
+        ),
+        'subscription_synced_at': now,
+        'subscription_sync_attempted_at': now
+    }
+
+
+def store_subscription(supabase, subscription):
+    response = supabase.table('users') \
+        .update(subscription_state(subscription)) \
+        .eq('stripe_subscription_id', subscription['id']) \
+        .execute()
+    invalidate_users(response.data)
+    return response
+
+
+def reconcile_subscriptions(supabase, max_age=timedelta(hours=6), batch_size=100):
+    """
+    Re-fetch subscriptions whose local copy is older than max_age, to pick
+    up anything a missed or failed webhook didn't deliver. Rows go oldest
+    attempt first. A failed fetch only moves subscription_sync_attempted_at,
+    so rows that keep failing wait their turn instead of filling every
+    batch, while subscription_synced_at still says the state is unknown.
+    """
+    stale_before = (datetime.now(timezone.utc) - max_age).isoformat()
+    response = supabase.table('users') \
+        .select('id, stripe_subscription_id') \
+        .not_.is_('stripe_subscription_id', 'null') \
+        .or_(f"subscription_sync_attempted_at.is.null,subscription_sync_attempted_at.lt.{stale_before}") \
+        .order('subscription_sync_attempted_at', desc=False, nullsfirst=True) \
+        .limit(batch_size) \
+        .execute()
+
+    synced = 0
+    for row in response.data or []:
+        try:
+            supabase.table('users') \
+                .update({'subscription_sync_attempted_at': datetime.now(timezone.utc).isoformat()}) \
+                .eq('id', row['id']) \
+                .execute()
+            subscription = stripe.Subscription.retrieve(row['stripe_subscription_id'])
+            store_subscription(supabase, subscription)
+            synced += 1
+        except Exception as e:
+            current_app.logger.warning(f"Could not reconcile subscription for user {row['id']}: {e}")
+    return synced
+
+
+def init_app(app):
+    @app.cli.command('reconcile-subscriptions')
+    @click.option('--interval', default=0, help='Repeat every N seconds instead of running once.')
+    @click.option('--max-age', default=6, help='Re-sync subscriptions not synced within this many hours.')
+    def reconcile_subscriptions_command(interval, max_age):
+        """Sync users.subscription_* with Stripe for missed webhooks."""
+        stripe.api_key = app.config['STRIPE_SECRET_KEY']
+        while True:
+            synced = reconcile_subscriptions(app.supabase, max_age=timedelta(hours=max_age))
+            click.echo(f"Reconciled {synced} subscriptions")
+            if not interval:
+                break
+            time.sleep(interval)
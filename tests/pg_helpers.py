@@ -0,0 +1,86 @@
+"""
+Shared fixture for the concurrency tests that run against a real Postgres.
+
+Each test gets its own schema, named after the test class and pid, with
+the tables it needs and the migrations under test applied. Workers open
+their own connections inside that schema and start together behind a
+barrier, so the statements really do race.
+"""
+import os
+import unittest
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_DATABASE_URL = os.getenv('LOCAL_DATABASE_URL')
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+requires_local_postgres = unittest.skipUnless(
+    LOCAL_DATABASE_URL, "LOCAL_DATABASE_URL must point at a disposable local Postgres"
+)
+
+
+class PostgresSchemaTestCase(unittest.TestCase):
+    SCHEMA_PREFIX = 'pg_test'
+    MIGRATIONS = ()
+
+    def setUp(self):
+        import psycopg2
+
+        self.psycopg2 = psycopg2
+        self.schema = f"{self.SCHEMA_PREFIX}_{os.getpid()}"
+        self.conn = psycopg2.connect(LOCAL_DATABASE_URL)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {self.schema}")
+            cur.execute(f"SET search_path TO {self.schema}")
+            self.create_tables(cur)
+            for name in self.MIGRATIONS:
+                with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                    cur.execute(f.read())
+
+    def tearDown(self):
+        with self.conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        self.conn.close()
+
+    def create_tables(self, cur):
+        """Create the tables (and seed rows) the migrations expect."""
+
+    def connect(self):
+        conn = self.psycopg2.connect(LOCAL_DATABASE_URL, options=f"-c search_path={self.schema}")
+        conn.autocommit = True
+        return conn
+
+    def run_concurrently(self, threads, work):
+        """
+        Run work(cur, n) for n in 1..threads, each on its own connection,
+        released together. Returns the results in completion order;
+        any exception fails the test.
+        """
+        barrier = threading.Barrier(threads)
+        lock = threading.Lock()
+        results = []
+        errors = []
+
+        def worker(n):
+            conn = self.connect()
+            try:
+                barrier.wait()
+                with conn.cursor() as cur:
+                    result = work(cur, n)
+                with lock:
+                    results.append(result)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(1, threads + 1)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        self.assertEqual(errors, [])
+        return results
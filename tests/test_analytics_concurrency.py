@@ -0,0 +1,58 @@
+import unittest
+from datetime import date
+from pg_helpers import PostgresSchemaTestCase, requires_local_postgres
+
+
+@requires_local_postgres
+class TestAnalyticsConcurrency(PostgresSchemaTestCase):
+    SCHEMA_PREFIX = 'analytics_test'
+    MIGRATIONS = ('001_business_analytics_increment.sql',)
+    THREADS = 50
+
+    def create_tables(self, cur):
+        cur.execute("""
+            CREATE TABLE business_analytics (
+                id bigserial PRIMARY KEY,
+                business_id bigint NOT NULL,
+                date date NOT NULL,
+                profile_views integer NOT NULL DEFAULT 0,
+                search_appearances integer NOT NULL DEFAULT 0
+            )
+        """)
+
+    def hammer(self, sql, params):
+        self.run_concurrently(self.THREADS, lambda cur, n: cur.execute(sql, params))
+
+    def fetch_counts(self, business_id):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT count(*), sum(profile_views), sum(search_appearances) "
+                "FROM business_analytics WHERE business_id = %s AND date = %s",
+                (business_id, date.today())
+            )
+            return cur.fetchone()
+
+    def test_no_lost_profile_views(self):
+        self.hammer(
+            "SELECT increment_business_analytics(%s, %s, 1, 0)",
+            (42, date.today())
+        )
+        rows, views, searches = self.fetch_counts(42)
+        self.assertEqual(rows, 1)
+        self.assertEqual(views, self.THREADS)
+        self.assertEqual(searches, 0)
+
+    def test_no_lost_bulk_search_appearances(self):
+        payload = f'[{{"business_id": 7, "date": "{date.today()}", "search_appearances": 2}}]'
+        self.hammer(
+            "SELECT increment_business_analytics_bulk(%s::jsonb)",
+            (payload,)
+        )
+        rows, views, searches = self.fetch_counts(7)
+        self.assertEqual(rows, 1)
+        self.assertEqual(views, 0)
+        self.assertEqual(searches, 2 * self.THREADS)
+
+
+if __name__ == '__main__':
+    unittest.main()
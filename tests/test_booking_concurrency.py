@@ -0,0 +1,44 @@
+import unittest
+from pg_helpers import PostgresSchemaTestCase, requires_local_postgres
+
+
+@requires_local_postgres
+class TestBookingConcurrency(PostgresSchemaTestCase):
+    SCHEMA_PREFIX = 'booking_test'
+    MIGRATIONS = ('005_appointments_unique_slot.sql',)
+    THREADS = 100
+
+    def create_tables(self, cur):
+        cur.execute("""
+            CREATE TABLE appointments (
+                id bigserial PRIMARY KEY,
+                user_id bigint NOT NULL,
+                business_id bigint NOT NULL,
+                date date NOT NULL,
+                time time NOT NULL,
+                confirmed boolean NOT NULL DEFAULT false
+            )
+        """)
+
+    def test_exactly_one_booking_wins(self):
+        def book(cur, user_id):
+            try:
+                cur.execute(
+                    "INSERT INTO appointments (user_id, business_id, date, time) VALUES (%s, 5, '2099-12-31', '10:00:00')",
+                    (user_id,)
+                )
+            except self.psycopg2.errors.UniqueViolation:
+                return 'slot_taken'
+            return 'booked'
+
+        outcomes = self.run_concurrently(self.THREADS, book)
+
+        self.assertEqual(outcomes.count('booked'), 1)
+        self.assertEqual(outcomes.count('slot_taken'), self.THREADS - 1)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM appointments")
+            self.assertEqual(cur.fetchone()[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
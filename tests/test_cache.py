@@ -0,0 +1,40 @@
+import time
+import unittest
+from cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        cache = TTLCache('test-counters', maxsize=10, ttl=60)
+        self.assertIsNone(cache.get(1))
+        cache.set(1, 'alice')
+        self.assertEqual(cache.get(1), 'alice')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache('test-lru', maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        cache = TTLCache('test-ttl', maxsize=10, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+
+    def test_invalidate(self):
+        cache = TTLCache('test-invalidate', maxsize=10, ttl=60)
+        cache.set(5, 'bob')
+        cache.invalidate(5)
+        self.assertIsNone(cache.get(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
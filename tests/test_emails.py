@@ -0,0 +1,46 @@
+import os
+import stat
+import tempfile
+import unittest
+from emails import email_templates, EmailTemplates, EMAILS, AppointmentBookedEmail, PasswordResetEmail
+
+
+class TestEmailTemplates(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        email_templates.init_app()
+
+    def test_every_email_is_compiled(self):
+        for email in EMAILS:
+            self.assertIn(email.template, email_templates.templates)
+
+    def test_booking_email(self):
+        subject, html = email_templates.render(AppointmentBookedEmail(
+            business_name='Yuba Threading',
+            name='<b>Sam</b>',
+            email='sam@example.com',
+            phone='555-0100',
+            date='2026-10-17',
+            time='2:30 PM'
+        ))
+        self.assertEqual(subject, "New Appointment for Yuba Threading")
+        self.assertIn('&lt;b&gt;Sam&lt;/b&gt;', html)
+        self.assertNotIn('Add to Google Calendar', html)
+
+    def test_reset_email_links_token(self):
+        subject, html = email_templates.render(PasswordResetEmail(reset_url='https://localate.test/reset/abc'))
+        self.assertEqual(subject, "Reset Your Password")
+        self.assertIn('href="https://localate.test/reset/abc"', html)
+
+    def test_default_bytecode_cache_is_private(self):
+        templates = EmailTemplates()
+        templates.init_app()
+        directory = templates.env.bytecode_cache.directory
+        self.assertNotEqual(directory, os.path.join(tempfile.gettempdir(), 'localate-email-templates'))
+        info = os.stat(directory)
+        self.assertEqual(info.st_uid, os.getuid())
+        self.assertEqual(stat.S_IMODE(info.st_mode), 0o700)
+
+
+if __name__ == '__main__':
+    unittest.main()
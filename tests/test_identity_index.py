@@ -0,0 +1,64 @@
+import unittest
+from bloom import BloomFilter
+from identity_index import IdentityIndex, conflicting_field
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"user{i}")
+        self.assertTrue(all(f"user{i}" in bloom for i in range(5000)))
+        false_positives = sum(f"other{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestIdentityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = IdentityIndex()
+        self.index.build([
+            {'id': 1, 'username': 'yuba', 'email': 'yuba@example.com'},
+            {'id': 2, 'username': 'Sam', 'email': None},
+        ])
+
+    def test_unknown_names_short_circuit(self):
+        self.assertFalse(self.index.might_exist('username', 'nobody-has-this'))
+        self.assertIsNone(self.index.find('email', 'fresh@example.com'))
+        self.assertEqual(self.index.stats()['short_circuits'], 2)
+
+    def test_known_names_are_case_insensitive_candidates(self):
+        self.assertTrue(self.index.might_exist('username', 'yuba'))
+        self.assertTrue(self.index.might_exist('username', 'sam'))
+        self.assertTrue(self.index.might_exist('email', 'YUBA@example.com'))
+
+    def test_add_after_insert(self):
+        self.index.add('newuser', 'new@example.com')
+        self.assertTrue(self.index.might_exist('username', 'newuser'))
+        self.assertTrue(self.index.might_exist('email', 'new@example.com'))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            self.index.find('phone', '555-0100')
+
+
+class TestConflictingField(unittest.TestCase):
+    def test_reads_constraint_name(self):
+        message = 'duplicate key value violates unique constraint "users_username_key"'
+        details = 'Key (username)=(myemail) already exists.'
+        self.assertEqual(conflicting_field(message, details), 'username')
+
+    def test_reads_case_insensitive_index(self):
+        message = 'duplicate key value violates unique constraint "users_email_lower_key"'
+        details = 'Key (email_key)=(sam@example.com) already exists.'
+        self.assertEqual(conflicting_field(message, details), 'email')
+        self.assertEqual(conflicting_field(None, 'Key (username_key)=(sam) already exists.'), 'username')
+
+    def test_falls_back_to_key_column(self):
+        self.assertEqual(conflicting_field(None, 'Key (email)=(a@b.co) already exists.'), 'email')
+
+    def test_ignores_values(self):
+        self.assertIsNone(conflicting_field('duplicate key', 'Key (slug)=(email) already exists.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from pg_helpers import PostgresSchemaTestCase, requires_local_postgres
+
+
+@requires_local_postgres
+class TestIdentityUniqueness(PostgresSchemaTestCase):
+    SCHEMA_PREFIX = 'identity_test'
+    MIGRATIONS = ('011_users_unique_identity.sql', '014_users_identity_case_insensitive.sql')
+
+    def create_tables(self, cur):
+        cur.execute("""
+            CREATE TABLE users (
+                id bigserial PRIMARY KEY,
+                username text NOT NULL,
+                email text NOT NULL,
+                confirmed boolean NOT NULL DEFAULT false
+            )
+        """)
+        cur.execute("INSERT INTO users (username, email) VALUES ('Sam', 'Sam@Example.com')")
+
+    def insert(self, username, email):
+        with self.conn.cursor() as cur:
+            cur.execute("INSERT INTO users (username, email) VALUES (%s, %s)", (username, email))
+
+    def test_username_differing_by_case_is_taken(self):
+        with self.assertRaises(self.psycopg2.errors.UniqueViolation) as raised:
+            self.insert('sam', 'other@example.com')
+        self.assertEqual(raised.exception.diag.constraint_name, 'users_username_lower_key')
+
+    def test_email_differing_by_case_is_taken(self):
+        with self.assertRaises(self.psycopg2.errors.UniqueViolation) as raised:
+            self.insert('someone', 'sam@example.com')
+        self.assertEqual(raised.exception.diag.constraint_name, 'users_email_lower_key')
+
+    def test_lookup_key_is_lower_cased(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT username_key, email_key FROM users")
+            self.assertEqual(cur.fetchone(), ('sam', 'sam@example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import random
+import unittest
+from leaderboard import LeaderboardService, trophies_keyset_filter
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.service = LeaderboardService()
+        self.service.build([
+            {'id': 1, 'name': 'Yuba Threading', 'trophies': 12, 'city': 'Yuba City', 'state': 'CA'},
+            {'id': 2, 'name': 'Sac Barbers', 'trophies': 30, 'city': 'Sacramento', 'state': 'CA'},
+            {'id': 3, 'name': 'Reno Nails', 'trophies': 12, 'city': 'Reno', 'state': 'NV'},
+            {'id': 4, 'name': 'West Sac Spa', 'trophies': 5, 'city': 'West Sacramento', 'state': 'CA'},
+            {'id': 5, 'name': 'No Location', 'trophies': None, 'city': None, 'state': None},
+        ])
+
+    def ids(self, **kwargs):
+        rows, total = self.service.page(**kwargs)
+        return [row['id'] for row in rows], total
+
+    def test_overall_order_and_paging(self):
+        self.assertEqual(self.ids(), ([2, 1, 3, 4, 5], 5))
+        self.assertEqual(self.ids(offset=1, limit=2), ([1, 3], 5))
+
+    def test_cursor_continues_after_last_row(self):
+        rows, total = self.service.page(limit=2)
+        self.assertEqual([(r['id'], r['rank']) for r in rows], [(2, 1), (1, 2)])
+        after = (rows[-1]['trophies'], rows[-1]['id'])
+        self.service.update_trophies(4, 50)
+        rows, _ = self.service.page(limit=2, after=after)
+        self.assertEqual([r['id'] for r in rows], [3, 5])
+
+    def test_cursor_pages_across_null_trophies(self):
+        self.service.upsert({'id': 6, 'name': 'Zero Spa', 'trophies': 0, 'city': None, 'state': None})
+        seen = []
+        after = None
+        while True:
+            rows, _ = self.service.page(limit=2, after=after)
+            if not rows:
+                break
+            seen.extend(r['id'] for r in rows)
+            # The API's cursor: NULL trophies are written as 0.
+            after = (rows[-1]['trophies'] or 0, rows[-1]['id'])
+        self.assertEqual(seen, [2, 1, 3, 4, 5, 6])
+
+    def test_keyset_filter_keeps_null_trophies(self):
+        self.assertEqual(
+            trophies_keyset_filter(5, 4),
+            "trophies.lt.5,and(trophies.eq.5,id.gt.4),trophies.is.null"
+        )
+        self.assertEqual(
+            trophies_keyset_filter(0, 5),
+            "trophies.lt.0,and(trophies.eq.0,id.gt.5),and(trophies.is.null,id.gt.5)"
+        )
+
+    def test_state_and_city_substring_filters(self):
+        self.assertEqual(self.ids(state='CA'), ([2, 1, 4], 3))
+        self.assertEqual(self.ids(city='sacramento'), ([2, 4], 2))
+        self.assertEqual(self.ids(city='Sacramento', state='NV'), ([], 0))
+
+    def test_ranks_share_ties(self):
+        self.assertEqual(self.service.rank(3), {'overall': 2, 'state': 1, 'city': 1})
+        self.assertEqual(self.service.rank(1)['overall'], 2)
+        self.assertIsNone(self.service.rank(99))
+
+    def test_incremental_updates(self):
+        self.service.update_trophies(4, 31)
+        self.assertEqual(self.ids(city='sacramento'), ([4, 2], 2))
+        self.service.upsert({'id': 1, 'city': 'Reno', 'state': 'NV'})
+        self.assertEqual(self.ids(state='NV'), ([1, 3], 2))
+        self.assertEqual(self.ids(state='CA'), ([4, 2], 2))
+        self.service.remove(2)
+        self.assertEqual(self.ids(), ([4, 1, 3, 5], 4))
+
+    def test_matches_rebuild_after_random_updates(self):
+        for _ in range(500):
+            self.service.update_trophies(random.randint(1, 5), random.randint(0, 40))
+        rows, _ = self.service.page(limit=100)
+        expected = LeaderboardService()
+        expected.build(rows)
+        for state in (None, 'CA', 'NV'):
+            self.assertEqual(self.service.page(state=state, limit=100), expected.page(state=state, limit=100))
+
+
+if __name__ == '__main__':
+    unittest.main()
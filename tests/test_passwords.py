@@ -0,0 +1,48 @@
+import time
+import unittest
+from werkzeug.security import generate_password_hash
+from passwords import PasswordHasher, PasswordPoolBusy
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def test_hash_and_verify_in_pool(self):
+        hasher = PasswordHasher(method=FAST_METHOD, workers=1)
+        password_hash = hasher.hash('correct horse')
+        self.assertTrue(hasher.verify(password_hash, 'correct horse'))
+        self.assertFalse(hasher.verify(password_hash, 'wrong horse'))
+
+    def test_rejects_when_saturated(self):
+        hasher = PasswordHasher(method=FAST_METHOD, workers=1, max_pending=1)
+        hasher._slots.acquire()
+        with self.assertRaises(PasswordPoolBusy):
+            hasher.hash('correct horse')
+        self.assertEqual(hasher.rejected, 1)
+        hasher._slots.release()
+        self.assertTrue(hasher.hash('correct horse'))
+
+    def test_timeout_is_busy_and_keeps_slot(self):
+        hasher = PasswordHasher(method=FAST_METHOD, workers=1, max_pending=1, timeout=0.05)
+        with self.assertRaises(PasswordPoolBusy):
+            hasher._run(time.sleep, 0.5)
+        with self.assertRaises(PasswordPoolBusy):
+            hasher.hash('correct horse')
+        self.assertTrue(hasher._slots.acquire(timeout=5))
+        hasher._slots.release()
+        hasher.timeout = 10
+        self.assertTrue(hasher.hash('correct horse'))
+
+    def test_needs_rehash_on_method_change(self):
+        hasher = PasswordHasher(method='pbkdf2:sha256:2000', workers=0)
+        self.assertTrue(hasher.needs_rehash(generate_password_hash('pw', method=FAST_METHOD)))
+        self.assertFalse(hasher.needs_rehash(hasher.hash('pw')))
+
+    def test_needs_rehash_with_short_method(self):
+        hasher = PasswordHasher(method='pbkdf2:sha256', workers=0)
+        self.assertFalse(hasher.needs_rehash(hasher.hash('pw')))
+        self.assertTrue(hasher.needs_rehash(generate_password_hash('pw', method=FAST_METHOD)))
+
+
+if __name__ == '__main__':
+    unittest.main()
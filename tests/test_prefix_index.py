@@ -0,0 +1,42 @@
+import unittest
+from prefix_index import PrefixIndex
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex(k=3)
+        self.index.build([
+            {'id': 1, 'name': 'Threading Yuba', 'review_count': 12},
+            {'id': 2, 'name': 'Yuba Barbers', 'review_count': 40},
+            {'id': 3, 'name': 'Barber Shop', 'review_count': 3},
+            {'id': 4, 'name': 'Bakery', 'review_count': None},
+        ])
+
+    def test_matches_any_word_start_by_review_count(self):
+        self.assertEqual(self.index.search('yu'), ['Yuba Barbers', 'Threading Yuba'])
+        self.assertEqual(self.index.search('BARB'), ['Yuba Barbers', 'Barber Shop'])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('zz'), [])
+        self.assertEqual(self.index.search('   '), [])
+
+    def test_upsert_moves_business(self):
+        self.index.upsert(3, 'Best Nails', 100)
+        self.assertEqual(self.index.search('barb'), ['Yuba Barbers'])
+        self.assertEqual(self.index.search('b'), ['Best Nails', 'Yuba Barbers', 'Bakery'])
+
+    def test_removal_refills_top_from_subtree(self):
+        for i in range(10, 20):
+            self.index.upsert(i, f'Salon {i}', i)
+        for i in range(19, 12, -1):
+            self.index.remove(i)
+        self.assertEqual(self.index.search('salon', limit=3), ['Salon 12', 'Salon 11', 'Salon 10'])
+
+    def test_long_query_beyond_trie_depth(self):
+        self.index.upsert(5, 'Extraordinarily Long Business Name Here', 1)
+        self.assertEqual(self.index.search('extraordinarily long business'), ['Extraordinarily Long Business Name Here'])
+        self.assertEqual(self.index.search('extraordinarily long businessx'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
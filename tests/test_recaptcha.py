@@ -0,0 +1,46 @@
+import unittest
+from recaptcha import RecaptchaVerifier, StubBackend
+
+
+class FailingBackend:
+    def verify(self, token, remote_ip=None):
+        raise TimeoutError("read timed out")
+
+
+class TestRecaptchaVerifier(unittest.TestCase):
+    def setUp(self):
+        self.verifier = RecaptchaVerifier()
+        self.verifier.backend = StubBackend()
+
+    def test_verified_token_is_reused_once(self):
+        self.assertTrue(self.verifier.verify('token-a', '10.0.0.1'))
+        self.assertTrue(self.verifier.verify('token-a', '10.0.0.1'))
+        self.assertEqual(self.verifier.backend.calls, 1)
+        self.assertEqual(self.verifier.stats()['calls'], 1)
+        self.verifier.verify('token-a', '10.0.0.1')
+        self.assertEqual(self.verifier.backend.calls, 2)
+
+    def test_cached_token_is_bound_to_address(self):
+        self.assertTrue(self.verifier.verify('token-d', '10.0.0.1'))
+        self.verifier.verify('token-d', '10.0.0.2')
+        self.assertEqual(self.verifier.backend.calls, 2)
+
+    def test_low_score_is_rejected_and_not_cached(self):
+        self.verifier.backend = StubBackend(score=0.2)
+        self.assertFalse(self.verifier.verify('token-b'))
+        self.assertFalse(self.verifier.verify('token-b'))
+        self.assertEqual(self.verifier.backend.calls, 2)
+        self.assertEqual(self.verifier.stats()['failures'], 2)
+
+    def test_upstream_error_fails_closed(self):
+        self.verifier.backend = FailingBackend()
+        self.assertFalse(self.verifier.verify('token-c'))
+        self.assertEqual(self.verifier.stats()['errors'], 1)
+
+    def test_empty_token(self):
+        self.assertFalse(self.verifier.verify(''))
+        self.assertEqual(self.verifier.backend.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import random
+import unittest
+from pg_helpers import PostgresSchemaTestCase, requires_local_postgres
+
+
+@requires_local_postgres
+class TestReviewAggregates(PostgresSchemaTestCase):
+    SCHEMA_PREFIX = 'reviews_test'
+    MIGRATIONS = ('007_reviews_aggregate.sql', '009_reviews_histogram.sql')
+    THREADS = 50
+
+    def create_tables(self, cur):
+        cur.execute("""
+            CREATE TABLE businesses (
+                id bigserial PRIMARY KEY,
+                name text NOT NULL,
+                review_count integer DEFAULT 0,
+                avg_rating numeric DEFAULT 0
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE reviews (
+                id bigserial PRIMARY KEY,
+                user_id bigint NOT NULL,
+                business_id bigint NOT NULL REFERENCES businesses(id),
+                rating integer NOT NULL,
+                comment text,
+                created_at timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("INSERT INTO businesses (id, name) VALUES (1, 'Yuba Threading')")
+        # Reviews written before the migration are picked up by its backfill.
+        cur.execute("INSERT INTO reviews (user_id, business_id, rating) VALUES (0, 1, 5), (-1, 1, 2)")
+
+    def stored(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT rating_sum, review_count, avg_rating FROM businesses WHERE id = 1")
+            return cur.fetchone()
+
+    def actual(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT sum(rating), count(*) FROM reviews WHERE business_id = 1")
+            return cur.fetchone()
+
+    def histograms(self):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT rating_count_1, rating_count_2, rating_count_3, rating_count_4, rating_count_5 "
+                "FROM businesses WHERE id = 1"
+            )
+            stored = list(cur.fetchone())
+            cur.execute("SELECT rating, count(*) FROM reviews WHERE business_id = 1 GROUP BY rating")
+            actual = [0] * 5
+            for rating, count in cur.fetchall():
+                actual[rating - 1] = count
+            return stored, actual
+
+    def test_concurrent_inserts_and_updates_stay_exact(self):
+        def write(cur, n):
+            cur.execute(
+                "INSERT INTO reviews (user_id, business_id, rating) VALUES (%s, 1, %s) RETURNING id",
+                (n, random.randint(1, 5))
+            )
+            review_id = cur.fetchone()[0]
+            cur.execute("UPDATE reviews SET rating = %s WHERE id = %s", (random.randint(1, 5), review_id))
+            if n % 5 == 0:
+                cur.execute("DELETE FROM reviews WHERE id = %s", (review_id,))
+
+        self.run_concurrently(self.THREADS, write)
+
+        rating_sum, review_count, avg_rating = self.stored()
+        actual_sum, actual_count = self.actual()
+        self.assertEqual((rating_sum, review_count), (actual_sum, actual_count))
+        self.assertAlmostEqual(float(avg_rating), actual_sum / actual_count, places=2)
+        stored_histogram, actual_histogram = self.histograms()
+        self.assertEqual(stored_histogram, actual_histogram)
+
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT * FROM reconcile_review_aggregates()")
+            self.assertEqual(cur.fetchall(), [])
+
+    def test_reconcile_fixes_drift(self):
+        with self.conn.cursor() as cur:
+            cur.execute("UPDATE businesses SET rating_sum = 99, review_count = 1, rating_count_4 = 3 WHERE id = 1")
+            cur.execute("SELECT business_id, actual_sum, actual_count FROM reconcile_review_aggregates(true)")
+            self.assertEqual(cur.fetchall(), [(1, 7, 2)])
+            cur.execute("SELECT * FROM reconcile_review_aggregates()")
+            self.assertEqual(cur.fetchall(), [])
+        self.assertEqual(self.stored()[:2], (7, 2))
+        self.assertEqual(self.histograms()[0], [0, 1, 0, 0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+import threading
+from pg_helpers import PostgresSchemaTestCase, requires_local_postgres
+
+
+@requires_local_postgres
+class TestTrophyConcurrency(PostgresSchemaTestCase):
+    SCHEMA_PREFIX = 'trophy_test'
+    MIGRATIONS = ('010_business_trophies_toggle.sql',)
+    TOGGLES = 1000
+    CONNECTIONS = 50
+    USERS = 150
+
+    def create_tables(self, cur):
+        cur.execute("""
+            CREATE TABLE businesses (
+                id bigserial PRIMARY KEY,
+                name text NOT NULL,
+                trophies integer DEFAULT 0
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE business_trophies (
+                id bigserial PRIMARY KEY,
+                business_id bigint NOT NULL REFERENCES businesses(id),
+                user_id bigint NOT NULL
+            )
+        """)
+        cur.execute("INSERT INTO businesses (id, name, trophies) VALUES (1, 'Yuba Threading', 0)")
+        # A stale count and a duplicate row, both fixed by the migration.
+        cur.execute("INSERT INTO business_trophies (business_id, user_id) VALUES (1, 1), (1, 1)")
+
+    def test_count_matches_rows_after_concurrent_toggles(self):
+        toggles = [random.randint(1, self.USERS) for _ in range(self.TOGGLES)]
+        lock = threading.Lock()
+
+        def worker(cur, n):
+            while True:
+                with lock:
+                    if not toggles:
+                        return
+                    user_id = toggles.pop()
+                cur.execute("SELECT new_count, has_trophy FROM toggle_business_trophy(1, %s)", (user_id,))
+                new_count, has_trophy = cur.fetchone()
+                assert 0 <= new_count <= self.USERS
+
+        self.run_concurrently(self.CONNECTIONS, worker)
+
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT trophies FROM businesses WHERE id = 1")
+            trophies = cur.fetchone()[0]
+            cur.execute("SELECT count(*), count(DISTINCT user_id) FROM business_trophies WHERE business_id = 1")
+            rows, users = cur.fetchone()
+        self.assertEqual(trophies, rows)
+        self.assertEqual(rows, users)
+
+    def test_missing_business_returns_nothing(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT * FROM toggle_business_trophy(999, 1)")
+            self.assertEqual(cur.fetchall(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ from werkzeug.utils import secure_filename
 from urllib.parse import urlparse
 import uuid
 import os
+from models import invalidate_user
 
 user_bp = Blueprint('user', __name__, url_prefix='/user')
 
@@ -54,6 +55,7 @@ def edit_profile():
         }
 
         supabase.table('users').update(update_data).eq('id', current_user.id).execute()
+        invalidate_user(current_user.id)
         return redirect(url_for('business.dashboard'))
 
     return render_template('edit_profile.html', user=current_user)
@@ -104,5 +106,6 @@ def upload_profile_pic():
     public_url = supabase.storage.from_(bucket_name).get_public_url(unique_filename)
 
     supabase.table('users').update({'profile_image_url': public_url}).eq('id', current_user.id).execute()
+    invalidate_user(current_user.id)
 
     return redirect(url_for('business.dashboard'))
\ No newline at end of file
@@ -1,8 +1,12 @@
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import time
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+_io_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='io-fanout')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -16,4 +20,34 @@ def confirm_token(token, expiration=3600):
         email = serializer.loads(token, salt='email-confirmation-salt', max_age=expiration)
     except Exception:
         return False
-    return email
\ No newline at end of file
+    return email
+
+def fan_out(calls, default_timeout=5):
+    """
+    Run independent I/O calls concurrently and wait for all of them.
+
+    `calls` maps a name to a zero-argument callable, or to a
+    (callable, timeout) pair. Every timeout is measured from the start of
+    the fan-out. Returns (results, errors): a call that raised or timed out
+    has no entry in results and its exception in errors. Callables run
+    outside the request context, so resolve current_user and friends first.
+    """
+    started = time.monotonic()
+    futures = {}
+    for name, call in calls.items():
+        func, timeout = call if isinstance(call, tuple) else (call, default_timeout)
+        futures[name] = (_io_pool.submit(func), timeout)
+
+    results = {}
+    errors = {}
+    for name, (future, timeout) in futures.items():
+        remaining = max(0, timeout - (time.monotonic() - started))
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeoutError as e:
+            current_app.logger.warning(f"{name} timed out after {timeout}s")
+            errors[name] = e
+        except Exception as e:
+            current_app.logger.warning(f"{name} failed: {e}")
+            errors[name] = e
+    return results, errors